@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 import os
 from typing import Optional, Dict, List
 import io
+import importlib.util
 import sys
 from pathlib import Path
 
@@ -24,6 +25,9 @@ except ImportError:
     # pyodbc no disponible - las funciones SQL Server mostrarán error apropiado
     pass
 
+# Motor Excel: xlsxwriter (escritura en streaming, mucho más rápido) si está instalado
+MOTOR_EXCEL = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'openpyxl'
+
 # Agregar directorio hashados al path
 hashados_path = Path(__file__).parent.parent / "hashados"
 if hashados_path.exists():
@@ -1541,8 +1545,13 @@ STORED_PROCEDURES = {
 
 
 def exportar_a_csv(df: pd.DataFrame, nombre_archivo: str) -> bytes:
-    """Exporta DataFrame a CSV en bytes para descarga"""
-    return df.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig')
+    """
+    Exporta DataFrame a CSV en bytes para descarga (UTF-8 con BOM para Excel)
+    pandas escribe directo al buffer binario, sin str intermedio
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8-sig')
+    return buffer.getvalue()
 
 
 def guardar_csv_en_carpeta(df: pd.DataFrame, pais: str, nombre_reporte: str, timestamp: str) -> str:
@@ -1558,7 +1567,7 @@ def guardar_csv_en_carpeta(df: pd.DataFrame, pais: str, nombre_reporte: str, tim
 def exportar_a_excel(dfs: Dict[str, pd.DataFrame], nombre_archivo: str) -> bytes:
     """Exporta múltiples DataFrames a Excel con hojas separadas"""
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output, engine=MOTOR_EXCEL) as writer:
         for sheet_name, df in dfs.items():
             # Truncar nombres de hoja a 31 caracteres (límite Excel)
             safe_name = sheet_name[:31]
@@ -1692,6 +1701,11 @@ def main():
             if historial.empty:
                 st.info("ℹ️ No hay historial de hashes aún. Descarga tablas para comenzar el seguimiento.")
             else:
+                # Columnas repetitivas como category: filtros y conteos sobre códigos enteros
+                for col in historial.select_dtypes('object').columns:
+                    if historial[col].nunique() / len(historial) < 0.5:
+                        historial[col] = historial[col].astype('category')
+                
                 # Filtros
                 col1, col2, col3 = st.columns(3)
                 
@@ -11,9 +11,11 @@ Fecha: 2025-01-22
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import pyodbc
 from datetime import datetime, timedelta
 import os
+import decimal
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -78,6 +80,13 @@ SERVERS_CONFIG = {
 
 DRIVER = 'ODBC Driver 18 for SQL Server'
 
+# Tipos Python de pyodbc (cursor.description) → dtype pandas
+# (decimal.Decimal se resuelve por precisión en dtype_desde_descripcion)
+DTYPES_SQL = {
+    bool: 'boolean',
+    datetime: 'datetime64[ns]',
+}
+
 # Tablas base a descargar
 TABLAS_BASE = [
     "movGC_DocumentoxDistribucion",
@@ -180,12 +189,56 @@ def get_connection(pais: str):
             f'TrustServerCertificate=yes;'
             f'Timeout=300;'
         )
-        return pyodbc.connect(conn_str, timeout=30)
+        conn = pyodbc.connect(conn_str, timeout=30)
+        # Opciones de sesión una sola vez por conexión (persisten entre cursores)
+        conn.execute("SET NOCOUNT ON; SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED").close()
+        return conn
     except Exception as e:
         st.error(f"❌ Error conectando a {pais}: {e}")
         return None
 
 
+def dtype_desde_descripcion(descripcion: tuple) -> str:
+    """Mapea una entrada de cursor.description a un dtype pandas compacto (None = object)"""
+    type_code, precision = descripcion[1], descripcion[4]
+    if type_code is int:
+        if precision and precision <= 5:
+            return 'Int16'
+        if precision and precision <= 10:
+            return 'Int32'
+        return 'Int64'
+    if type_code is float:
+        # real → precisión 24, float → 53
+        return 'float32' if precision and precision <= 24 else 'float64'
+    if type_code is decimal.Decimal:
+        # float64 conserva ~15 dígitos significativos: numeric/money más anchos
+        # (importes grandes, claves numeric(38,x)) se quedan como Decimal sin redondear
+        return 'Float64' if precision and precision <= 15 else None
+    return DTYPES_SQL.get(type_code)
+
+
+def filas_a_dataframe(rows: list, description: list) -> pd.DataFrame:
+    """Construye DataFrame columnar desde filas de pyodbc (transpone con zip en C)
+    
+    Cada columna se convierte al dtype indicado por cursor.description para
+    no dejar enteros/decimales/fechas como objetos Python en memoria.
+    """
+    datos = {}
+    for i, valores in enumerate(zip(*rows)):
+        serie = pd.Series(valores, dtype=object)
+        dtype = dtype_desde_descripcion(description[i])
+        if dtype:
+            try:
+                serie = serie.astype(dtype)
+            except (TypeError, ValueError, OverflowError):
+                pass  # Se conserva object si el dato no encaja (p.ej. fechas fuera de rango)
+        datos[i] = serie
+    df = pd.DataFrame(datos)
+    # Asignar nombres después: admite columnas duplicadas que se desambiguan luego
+    df.columns = [col[0] for col in description]
+    return df
+
+
 def desambiguar_columnas(df: pd.DataFrame) -> pd.DataFrame:
     """Renombra columnas duplicadas agregando sufijos _1, _2, etc."""
     if df.empty:
@@ -243,40 +296,31 @@ def agregar_columna_ean(df: pd.DataFrame, pais: str) -> pd.DataFrame:
     try:
         codigo_pais = {'CHILE': 'CL', 'PERU': 'PE', 'COLOMBIA': 'CO', 'ECUADOR': 'EC'}.get(pais, 'CL')
         
-        cursor.execute("SET NOCOUNT ON")
-        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
-        
-        query_ean = f"""
+        query_ean = """
         SELECT DISTINCT
             RTRIM(cProducto) AS cProducto,
             RTRIM(cProductoEquiv) AS EAN
         FROM dbo.maeGC_ProductoEquiv WITH (NOLOCK)
         WHERE cEquivalencia = 'EAN12' 
-            AND cPais = '{codigo_pais}'
+            AND cPais = ?
         OPTION (MAXDOP 4)
         """
         
-        cursor.execute(query_ean)
+        cursor.execute(query_ean, (codigo_pais,))
         columns_ean = [col[0] for col in cursor.description]
         rows_ean = cursor.fetchall()
         
         if rows_ean and columns_ean:
-            df_ean = pd.DataFrame.from_records(rows_ean, columns=columns_ean)
+            # El servidor ya entrega cProducto con RTRIM: el mapa no se vuelve a limpiar
+            ean_map = {producto: ean for producto, ean in rows_ean}
             
-            df['_codigo_limpio'] = df[col_producto].astype(str).str.strip()
-            df_ean['cProducto'] = df_ean['cProducto'].astype(str).str.strip()
+            # La salida del SP no viene con RTRIM: los códigos del df sí se limpian
+            codigos = df[col_producto].astype(str).str.strip()
             
-            df = df.merge(
-                df_ean[['cProducto', 'EAN']],
-                left_on='_codigo_limpio',
-                right_on='cProducto',
-                how='left'
-            )
-            
-            df.drop(columns=['_codigo_limpio', 'cProducto'], inplace=True, errors='ignore')
-            df['EAN'] = df['EAN'].fillna('').astype(str)
+            ean = codigos.map(ean_map)
+            ean_count = int(ean.notna().sum())
+            df['EAN'] = ean.fillna('')
             
-            ean_count = (df['EAN'] != '').sum()
             st.success(f"✅ {pais}: {ean_count:,} códigos EAN agregados ({ean_count/len(df)*100:.1f}%)")
         else:
             df['EAN'] = ''
@@ -301,9 +345,6 @@ def ejecutar_sp(pais: str, sp_name: str, params: list = None, agregar_ean: bool
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SET NOCOUNT ON")
-        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
-        
         if params:
             placeholders = ', '.join(['?' for _ in params])
             query = f"EXEC {sp_name} {placeholders}"
@@ -322,7 +363,7 @@ def ejecutar_sp(pais: str, sp_name: str, params: list = None, agregar_ean: bool
             all_rows.extend(chunk)
         
         if all_rows and columns:
-            df = pd.DataFrame.from_records(all_rows, columns=columns)
+            df = filas_a_dataframe(all_rows, cursor.description)
             
             # Desambiguar columnas duplicadas
             df = desambiguar_columnas(df)
@@ -382,15 +423,15 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
     try:
         columna_fecha = detectar_columna_fecha(pais, tabla)
         
-        cursor.execute("SET NOCOUNT ON")
-        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
-        
         codigo_pais = {'CHILE': 'CL', 'PERU': 'PE', 'COLOMBIA': 'CO', 'ECUADOR': 'EC'}.get(pais, 'CL')
+        # Fecha como parámetro (datetime, no literal): un solo plan en caché para todas las fechas
+        fecha_inicio = datetime.combine((datetime.now() - timedelta(days=36*30)).date(), datetime.min.time())
+        parametros = ()
         
         # Query especial para movGC_vtDocumentoVtaDet con EAN
         if tabla.upper() == 'MOVGC_VTDOCUMENTOVTADET':
             if columna_fecha:
-                fecha_inicio = (datetime.now() - timedelta(days=36*30)).strftime('%Y-%m-%d')
+                parametros = (codigo_pais, fecha_inicio)
                 query = f"""
                 WITH EAN_LOOKUP AS (
                     SELECT 
@@ -398,17 +439,18 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
                         RTRIM(cProductoEquiv) AS EAN
                     FROM dbo.maeGC_ProductoEquiv WITH (NOLOCK)
                     WHERE cEquivalencia = 'EAN12' 
-                        AND cPais = '{codigo_pais}'
+                        AND cPais = ?
                 )
                 SELECT 
                     d.*,
                     COALESCE(e.EAN, '') AS EAN
                 FROM {tabla} d WITH (NOLOCK, INDEX(0))
                 LEFT JOIN EAN_LOOKUP e ON RTRIM(d.cProductoVta) = e.cProducto
-                WHERE d.{columna_fecha} >= '{fecha_inicio}'
+                WHERE d.{columna_fecha} >= ?
                 OPTION (MAXDOP 4, OPTIMIZE FOR UNKNOWN)
                 """
             else:
+                parametros = (codigo_pais,)
                 query = f"""
                 WITH EAN_LOOKUP AS (
                     SELECT 
@@ -416,7 +458,7 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
                         RTRIM(cProductoEquiv) AS EAN
                     FROM dbo.maeGC_ProductoEquiv WITH (NOLOCK)
                     WHERE cEquivalencia = 'EAN12' 
-                        AND cPais = '{codigo_pais}'
+                        AND cPais = ?
                 )
                 SELECT 
                     d.*,
@@ -426,11 +468,11 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
                 OPTION (MAXDOP 4)
                 """
         elif columna_fecha:
-            fecha_inicio = (datetime.now() - timedelta(days=36*30)).strftime('%Y-%m-%d')
+            parametros = (fecha_inicio,)
             query = f"""
             SELECT * 
             FROM {tabla} WITH (NOLOCK, INDEX(0))
-            WHERE {columna_fecha} >= '{fecha_inicio}'
+            WHERE {columna_fecha} >= ?
             OPTION (MAXDOP 4, OPTIMIZE FOR UNKNOWN)
             """
         else:
@@ -439,7 +481,7 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
             OPTION (MAXDOP 4)
             """
         
-        cursor.execute(query)
+        cursor.execute(query, parametros)
         columns = [col[0] for col in cursor.description]
         
         chunk_size = 5000
@@ -451,13 +493,14 @@ def descargar_tabla(pais: str, tabla: str) -> pd.DataFrame:
             all_rows.extend(chunk)
         
         if all_rows and columns:
-            df = pd.DataFrame.from_records(all_rows, columns=columns)
+            df = filas_a_dataframe(all_rows, cursor.description)
             
             # Desambiguar columnas duplicadas
             df = desambiguar_columnas(df)
             
             if tabla.upper() == 'MOVGC_VTDOCUMENTOVTADET' and 'EAN' in df.columns:
-                ean_count = (df['EAN'] != '').sum()
+                # '' y None son falsy: conteo en un solo loop C sin comparar strings
+                ean_count = np.count_nonzero(df['EAN'].to_numpy())
                 st.success(f"✅ {pais}: Columna EAN incluida - {ean_count:,} de {len(df):,} ({ean_count/len(df)*100:.1f}%)")
             
             return df
@@ -17,6 +17,8 @@ from typing import List, Tuple, Dict
 import logging
 from dotenv import load_dotenv
 
+from _paths import resolve_base_dir
+
 # Cargar configuración
 load_dotenv()
 
@@ -32,17 +34,11 @@ logger = logging.getLogger(__name__)
 # CONFIGURACIÓN
 # ============================================================================
 
-# Leer desde .env (cuando instales Drive Desktop)
-DRIVE_BASE_DIR = os.getenv("DRIVE_BASE_DIR", r"G:\Mi unidad\ETL_Snowflake")
+# Leer desde .env (con fallback a carpeta local para pruebas)
+DRIVE_BASE_DIR = str(resolve_base_dir())
 PAISES_STR = os.getenv("PAISES_FOLDERS", "CHILE,COLOMBIA,ECUADOR,PERU")
 PAISES = [p.strip() for p in PAISES_STR.split(",") if p.strip()]
 
-# Fallback a carpeta local para pruebas
-if not Path(DRIVE_BASE_DIR).exists():
-    logger.warning(f"⚠️  Google Drive no detectado en {DRIVE_BASE_DIR}")
-    logger.info("   Usando carpeta local de pruebas...")
-    DRIVE_BASE_DIR = r"C:\Ciencia de Datos\otros_datos"
-
 
 # ============================================================================
 # MAPEO DE NORMALIZACIÓN - Snowflake Standard
@@ -16,6 +16,8 @@ from typing import List, Tuple
 import logging
 from dotenv import load_dotenv
 
+from _paths import resolve_base_dir
+
 # Cargar configuración
 load_dotenv()
 
@@ -31,18 +33,16 @@ logger = logging.getLogger(__name__)
 # CONFIGURACIÓN
 # ============================================================================
 
-DRIVE_BASE_DIR = os.getenv("DRIVE_BASE_DIR", r"G:\Mi unidad\ETL_Snowflake")
+# Drive o fallback local (probe compartido en _paths)
+DRIVE_BASE_DIR = str(resolve_base_dir())
 PAISES_STR = os.getenv("PAISES_FOLDERS", "CHILE,COLOMBIA,ECUADOR,PERU")
 PAISES = [p.strip() for p in PAISES_STR.split(",") if p.strip()]
 
-# Fallback a local
-if not Path(DRIVE_BASE_DIR).exists():
-    logger.warning(f"⚠️  Google Drive no detectado en {DRIVE_BASE_DIR}")
-    logger.info("   Usando carpeta local de pruebas...")
-    DRIVE_BASE_DIR = r"C:\Ciencia de Datos\otros_datos"
+# Patrón para detectar timestamp: _YYYYMMDD_HHMMSS (compilado una vez)
+TIMESTAMP_PATTERN = re.compile(r"_\d{8}_\d{6}")
 
-# Patrón para detectar timestamp: _YYYYMMDD_HHMMSS
-TIMESTAMP_PATTERN = r"_\d{8}_\d{6}"
+# Guiones bajos consecutivos
+GUIONES_MULTIPLES = re.compile(r"_+")
 
 
 def renombrar_archivos_pais(pais: str, dry_run: bool = True) -> List[Tuple[str, str]]:
@@ -63,7 +63,12 @@ def renombrar_archivos_pais(pais: str, dry_run: bool = True) -> List[Tuple[str,
         return []
     
     cambios = []
-    archivos_csv = [f for f in pais_dir.glob("*.csv") if f.is_file()]
+    # scandir reutiliza el tipo de entrada del readdir: sin stat extra por archivo (clave en Drive)
+    with os.scandir(pais_dir) as it:
+        archivos_csv = [
+            e for e in it
+            if e.name.endswith(".csv") and e.is_file(follow_symlinks=False)
+        ]
     
     if not archivos_csv:
         logger.info(f"ℹ️  {pais}: No se encontraron archivos CSV")
@@ -72,6 +77,8 @@ def renombrar_archivos_pais(pais: str, dry_run: bool = True) -> List[Tuple[str,
     logger.info(f"\n📁 Procesando carpeta: {pais}")
     logger.info(f"   Archivos encontrados: {len(archivos_csv)}")
     
+    rutas = {}
+    
     for archivo in archivos_csv:
         nombre_original = archivo.name
         
@@ -81,7 +88,7 @@ def renombrar_archivos_pais(pais: str, dry_run: bool = True) -> List[Tuple[str,
         
         # Construir nuevo nombre
         # 1. Remover timestamp si existe
-        nombre_nuevo = re.sub(TIMESTAMP_PATTERN, "", nombre_original)
+        nombre_nuevo = TIMESTAMP_PATTERN.sub("", nombre_original)
         
         # 2. Garantizar que termine con _PAIS_normalizado.csv
         base_name = nombre_nuevo.replace("_normalizado.csv", "")
@@ -93,29 +100,36 @@ def renombrar_archivos_pais(pais: str, dry_run: bool = True) -> List[Tuple[str,
         nombre_nuevo = f"{base_name}_{pais}_normalizado.csv"
         
         # 3. Limpiar guiones bajos múltiples
-        while "__" in nombre_nuevo:
-            nombre_nuevo = nombre_nuevo.replace("__", "_")
+        nombre_nuevo = GUIONES_MULTIPLES.sub("_", nombre_nuevo)
         
         if nombre_original != nombre_nuevo:
             cambios.append((nombre_original, nombre_nuevo))
-            logger.info(f"   📝 {nombre_original}")
-            logger.info(f"      → {nombre_nuevo}")
+            rutas[nombre_original] = archivo.path
     
     if not cambios:
         logger.info(f"   ✓ No se requieren cambios")
         return []
     
+    # Detalle de cambios en un solo registro (un lock/flush en vez de dos por archivo)
+    logger.info("\n".join(
+        f"   📝 {original}\n      → {nuevo}" for original, nuevo in cambios
+    ))
+    
     # Ejecutar renombrado si no es dry-run
     if not dry_run:
+        renombrados = []
         for original, nuevo in cambios:
-            ruta_original = pais_dir / original
+            ruta_original = Path(rutas[original])
             ruta_nueva = pais_dir / nuevo
             
             try:
                 ruta_original.rename(ruta_nueva)
-                logger.info(f"   ✓ Renombrado: {original} → {nuevo}")
+                renombrados.append(f"   ✓ Renombrado: {original} → {nuevo}")
             except Exception as e:
                 logger.error(f"   ❌ Error renombrando {original}: {e}")
+        
+        if renombrados:
+            logger.info("\n".join(renombrados))
     
     return cambios
 
@@ -6,27 +6,36 @@ Procesa archivos *_normalizado.csv desde Google Drive Desktop
 IMPORTANTE: 
 - Crea backups automáticos ({TABLA}_OLD) antes de reemplazar tablas
 - Detecta separador CSV automáticamente (';' o ',')
-- Usa Pandas+Polars para máxima compatibilidad
+- Usa Polars (con fallback a Pandas) para máxima compatibilidad
 
 Autor: Sistema
 Fecha: 2026-01-22
 """
 
 import os
+import re
+import codecs
 import sys
 import logging
 import tempfile
+import threading
 import shutil
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Set
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 import polars as pl
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import pyarrow.parquet as pq
 import snowflake.connector
 from snowflake.connector import ProgrammingError
+from snowflake.connector.pandas_tools import write_pandas
+
+from _paths import resolve_base_dir
 
 # Cargar variables de entorno
 load_dotenv()
@@ -36,18 +45,9 @@ load_dotenv()
 # ============================================================================
 
 # Leer desde .env
-DRIVE_BASE_DIR = os.getenv("DRIVE_BASE_DIR", r"G:\Mi unidad\ETL_Snowflake")
 PAISES_STR = os.getenv("PAISES_FOLDERS", "CHILE,COLOMBIA,ECUADOR,PERU")
 PAISES = [p.strip() for p in PAISES_STR.split(",") if p.strip()]
 
-# Fallback a local
-if not Path(DRIVE_BASE_DIR).exists():
-    logging.warning(f"⚠️  Google Drive no detectado en {DRIVE_BASE_DIR}")
-    logging.info("   Usando carpeta local de pruebas...")
-    DRIVE_BASE_DIR = r"C:\Ciencia de Datos\otros_datos"
-
-BASE_DIR = Path(DRIVE_BASE_DIR)
-
 # Configuración Snowflake desde .env
 SNOWFLAKE_CONFIG = {
     "account": os.getenv("SNOWFLAKE_ACCOUNT"),
@@ -69,6 +69,39 @@ CSV_BATCH_SIZE = int(os.getenv("CSV_BATCH_SIZE", "100000"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
 TRUNCATE_BEFORE_LOAD = os.getenv("TRUNCATE_BEFORE_LOAD", "False").upper() == "TRUE"
 
+# Parquet en partes para PUT y COPY INTO paralelos
+PARQUET_CHUNK_ROWS = int(os.getenv("PARQUET_CHUNK_ROWS", "1000000"))
+
+# Subida paralela a stage (PUT / write_pandas)
+PUT_PARALLEL = int(os.getenv("PUT_PARALLEL", "8"))
+WRITE_PANDAS_CHUNK_ROWS = int(os.getenv("WRITE_PANDAS_CHUNK_ROWS", "500000"))
+
+# Archivos cargados en paralelo (un solo pool para todos los países)
+MAX_CARGAS_PARALELAS = int(os.getenv("MAX_CARGAS_PARALELAS", "4"))
+
+# Bytes leídos para detectar el separador CSV
+SEPARADOR_SAMPLE_BYTES = 65536
+
+# Rachas de caracteres no alfanuméricos o guiones bajos en nombres de tabla
+CARACTERES_NO_VALIDOS = re.compile(r"[\W_]+")
+
+# Tipos Polars → Snowflake (lookup por hash, sin comparar strings)
+TIPOS_SNOWFLAKE = {
+    pl.Int8: "INTEGER",
+    pl.Int16: "INTEGER",
+    pl.Int32: "INTEGER",
+    pl.Int64: "INTEGER",
+    pl.UInt8: "INTEGER",
+    pl.UInt16: "INTEGER",
+    pl.UInt32: "INTEGER",
+    pl.UInt64: "INTEGER",
+    pl.Float32: "FLOAT",
+    pl.Float64: "FLOAT",
+    pl.Boolean: "BOOLEAN",
+    pl.Date: "DATE",
+    pl.Time: "TIME",
+}
+
 # ============================================================================
 # LOGGING
 # ============================================================================
@@ -79,17 +112,36 @@ LOG_DIR.mkdir(exist_ok=True)
 
 log_file = LOG_DIR / f"carga_snowflake_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 
+# País que procesa el hilo actual (las cargas de todos los países comparten pool)
+CONTEXTO_LOG = threading.local()
+
+
+def prefijo_pais(record: logging.LogRecord) -> bool:
+    """Filtro de logging: agrega '[PAIS] ' a cada línea emitida desde un hilo de carga"""
+    pais = getattr(CONTEXTO_LOG, 'pais', None)
+    record.pais = f"[{pais}] " if pais else ""
+    return True
+
+
+handlers = [
+    logging.FileHandler(log_file, encoding='utf-8'),
+    logging.StreamHandler(sys.stdout)
+]
+for handler in handlers:
+    handler.addFilter(prefijo_pais)
+
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
+    format="%(asctime)s [%(levelname)s] %(pais)s%(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=handlers
 )
 logger = logging.getLogger(__name__)
 
+# Drive o fallback local (probe compartido en _paths; tras configurar logging
+# para que el aviso de fallback quede en el archivo de log)
+BASE_DIR = resolve_base_dir()
+
 # ============================================================================
 # FUNCIONES DE UTILIDAD
 # ============================================================================
@@ -113,41 +165,29 @@ def normalizar_nombre_tabla(nombre_archivo: str, pais: str) -> str:
     # Remover extensión y sufijo _normalizado
     nombre = nombre_archivo.replace("_normalizado.csv", "")
     
-    # Normalizar acentos: Único → Unico
-    nombre = unicodedata.normalize('NFKD', nombre)
-    nombre = ''.join([c for c in nombre if not unicodedata.combining(c)])
+    # Convertir a mayúsculas antes de quitar acentos (ß → SS, como antes)
+    nombre = nombre.upper()
     
-    # Limpiar caracteres especiales (emojis, símbolos)
-    nombre_limpio = ''.join(c if c.isalnum() or c == '_' else '_' for c in nombre)
+    # Normalizar acentos: Único → UNICO (NFKD + ASCII descarta marcas y emojis en C)
+    nombre = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
     
-    # Eliminar guiones bajos múltiples
-    while '__' in nombre_limpio:
-        nombre_limpio = nombre_limpio.replace('__', '_')
-    
-    # Convertir a mayúsculas
-    nombre_limpio = nombre_limpio.upper().strip('_')
+    # Limpiar caracteres especiales (emojis, símbolos) y colapsar guiones bajos en una pasada
+    nombre_limpio = CARACTERES_NO_VALIDOS.sub('_', nombre).strip('_')
     
     return nombre_limpio
 
 
-def mapear_tipo_snowflake(dtype: str) -> str:
+def mapear_tipo_snowflake(dtype: pl.DataType) -> str:
     """Mapea tipos de Polars a tipos de Snowflake"""
-    dtype_str = str(dtype).lower()
-    
-    if 'int' in dtype_str or 'uint' in dtype_str:
-        return "INTEGER"
-    elif 'float' in dtype_str or 'decimal' in dtype_str:
+    tipo_sf = TIPOS_SNOWFLAKE.get(dtype)
+    if tipo_sf:
+        return tipo_sf
+    # Tipos parametrizados (unidad de tiempo, zona, precisión)
+    if isinstance(dtype, pl.Datetime):
+        return "TIMESTAMP_NTZ"
+    if isinstance(dtype, pl.Decimal):
         return "FLOAT"
-    elif 'bool' in dtype_str:
-        return "BOOLEAN"
-    elif 'date' in dtype_str:
-        if 'datetime' in dtype_str or 'timestamp' in dtype_str:
-            return "TIMESTAMP_NTZ"
-        return "DATE"
-    elif 'time' in dtype_str:
-        return "TIME"
-    else:
-        return "VARCHAR(16777216)"
+    return "VARCHAR(16777216)"
 
 
 # ============================================================================
@@ -174,22 +214,29 @@ def get_snowflake_connection():
 # OPERACIONES SNOWFLAKE
 # ============================================================================
 
-def crear_tabla_snowflake(conn, schema: str, tabla: str, df: pl.DataFrame):
+def obtener_tablas_existentes(conn, schema: str) -> Set[str]:
+    """Lee una sola vez las tablas existentes del schema (evita SHOW TABLES por tabla)"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'",
+            (schema,)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def crear_tabla_snowflake(cursor, schema: str, tabla: str, df: pl.DataFrame, tablas_existentes: Set[str]):
     """
     Crea tabla en Snowflake basada en el esquema del DataFrame Polars
     ANTES de crear, guarda backup de tabla existente como {TABLA}_OLD
     """
-    cursor = conn.cursor()
-    
     try:
         full_table = f"{quote_ident(schema)}.{quote_ident(tabla)}"
         tabla_old = f"{tabla}_OLD"
         full_table_old = f"{quote_ident(schema)}.{quote_ident(tabla_old)}"
         
-        # 1. Verificar si tabla existe
-        check_sql = f"SHOW TABLES LIKE '{tabla}' IN SCHEMA {quote_ident(schema)}"
-        cursor.execute(check_sql)
-        tabla_existe = len(cursor.fetchall()) > 0
+        # 1. Verificar si tabla existe (consulta local al set precargado)
+        tabla_existe = tabla in tablas_existentes
         
         if tabla_existe:
             logger.info(f"⚠️  Tabla {tabla} existe. Creando backup...")
@@ -209,42 +256,46 @@ def crear_tabla_snowflake(conn, schema: str, tabla: str, df: pl.DataFrame):
                 logger.warning(f"   No se pudo renombrar a _OLD: {e}")
         
         # 4. Crear tabla nueva con estructura del CSV
-        columnas_ddl = []
-        for col_name, dtype in zip(df.columns, df.dtypes):
-            tipo_sf = mapear_tipo_snowflake(dtype)
-            columnas_ddl.append(f"{quote_ident(col_name)} {tipo_sf}")
+        columnas_ddl = [
+            f"{quote_ident(col_name)} {mapear_tipo_snowflake(dtype)}"
+            for col_name, dtype in df.schema.items()
+        ]
         
         columnas_str = ',\n  '.join(columnas_ddl)
         ddl = f"CREATE TABLE {full_table} (\n  {columnas_str}\n)"
         
         logger.info(f"   Creando tabla nueva: {full_table}")
         cursor.execute(ddl)
+        tablas_existentes.add(tabla)
         logger.info(f"   ✓ Tabla creada: {tabla} ({len(columnas_ddl)} columnas)")
         
     except Exception as e:
         logger.error(f"❌ Error creando tabla {tabla}: {e}")
         raise
-    finally:
-        cursor.close()
 
 
-def copy_parquet_to_snowflake(conn, schema: str, tabla: str, parquet_path: str):
-    """Carga archivo Parquet a Snowflake usando PUT + COPY INTO"""
-    cursor = conn.cursor()
-    
+def copy_parquet_to_snowflake(cursor, schema: str, tabla: str, parquet_dir: str):
+    """
+    Carga archivos Parquet a Snowflake usando PUT + COPY INTO
+    Sube todas las partes {tabla}_NNNN.parquet en paralelo a un prefijo propio de la tabla
+    """
     try:
         full_table = f"{quote_ident(schema)}.{quote_ident(tabla)}"
+        stage_dir = f"@~/staged_data/{tabla}/"
+        
+        # Limpiar restos de cargas anteriores en el prefijo de la tabla
+        cursor.execute(f"REMOVE {stage_dir}")
         
-        # PUT archivo a stage interno
-        logger.info(f"   Subiendo Parquet a stage Snowflake...")
-        put_cmd = f"PUT file://{parquet_path} @~/staged_data AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+        # PUT archivos a stage interno (subida concurrente)
+        logger.info(f"   Subiendo Parquet a stage Snowflake (PARALLEL={PUT_PARALLEL})...")
+        parquet_glob = Path(parquet_dir, f"{tabla}_*.parquet").as_posix()
+        put_cmd = f"PUT file://{parquet_glob} {stage_dir} AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL={PUT_PARALLEL}"
         cursor.execute(put_cmd)
         
-        # COPY INTO desde stage
-        parquet_filename = Path(parquet_path).name
+        # COPY INTO desde stage (Snowflake procesa las partes en paralelo)
         copy_cmd = f"""
         COPY INTO {full_table}
-        FROM @~/staged_data/{parquet_filename}
+        FROM {stage_dir}
         FILE_FORMAT = (TYPE = PARQUET)
         MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
         ON_ERROR = ABORT_STATEMENT
@@ -254,23 +305,88 @@ def copy_parquet_to_snowflake(conn, schema: str, tabla: str, parquet_path: str):
         cursor.execute(copy_cmd)
         
         # Limpiar stage
-        cursor.execute(f"REMOVE @~/staged_data/{parquet_filename}")
+        cursor.execute(f"REMOVE {stage_dir}")
         
         logger.info(f"   ✓ Datos cargados exitosamente a {tabla}")
         
     except Exception as e:
         logger.error(f"❌ Error en COPY INTO para {tabla}: {e}")
         raise
-    finally:
-        cursor.close()
+
+
+def write_pandas_to_snowflake(conn, schema: str, tabla: str, df: pd.DataFrame):
+    """Carga DataFrame Pandas con write_pandas (Parquet → stage → COPY en partes paralelas)"""
+    try:
+        logger.info(f"   Cargando con write_pandas (PARALLEL={PUT_PARALLEL})...")
+        success, nchunks, nrows, _ = write_pandas(
+            conn,
+            df,
+            table_name=tabla,
+            schema=schema,
+            chunk_size=WRITE_PANDAS_CHUNK_ROWS,
+            parallel=PUT_PARALLEL,
+            quote_identifiers=True
+        )
+        if not success:
+            raise RuntimeError(f"write_pandas no completó la carga ({nrows:,} filas en {nchunks} partes)")
+        
+        logger.info(f"   ✓ Datos cargados exitosamente a {tabla} ({nchunks} partes)")
+        
+    except Exception as e:
+        logger.error(f"❌ Error en write_pandas para {tabla}: {e}")
+        raise
 
 
 # ============================================================================
 # CARGA DE ARCHIVOS
 # ============================================================================
 
-def cargar_csv_a_snowflake(conn, csv_path: Path, pais: str, schema: str) -> Dict:
-    """Carga un archivo CSV normalizado a Snowflake"""
+def escribir_parquet_partes(lotes, esquema: pa.Schema, tabla_dir: str, tabla: str) -> int:
+    """
+    Escribe lotes Arrow como {tabla}_NNNN.parquet de ~PARQUET_CHUNK_ROWS filas cada uno
+    (varios archivos: PUT y COPY INTO trabajan en paralelo; en memoria solo un lote)
+    """
+    chunk_rows = max(1, PARQUET_CHUNK_ROWS)
+    escritor = None
+    partes = filas_parte = 0
+    try:
+        for lote in lotes:
+            if escritor is None:
+                parquet_path = os.path.join(tabla_dir, f"{tabla}_{partes:04d}.parquet")
+                escritor = pq.ParquetWriter(
+                    parquet_path, esquema,
+                    compression="zstd", compression_level=1,
+                    use_dictionary=True, write_statistics=False
+                )
+                partes += 1
+            escritor.write_batch(lote)
+            filas_parte += lote.num_rows
+            if filas_parte >= chunk_rows:
+                escritor.close()
+                escritor = None
+                filas_parte = 0
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return partes
+
+
+def leer_csv_arrow(csv_path: Path, separador: str) -> pa.Table:
+    """Lee CSV directo a tabla Arrow (mismos nulos que la lectura con Polars)"""
+    return pacsv.read_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        parse_options=pacsv.ParseOptions(delimiter=separador, invalid_row_handler=lambda row: 'skip'),
+        convert_options=pacsv.ConvertOptions(
+            null_values=["", "NULL", "None", "NaN"],
+            strings_can_be_null=True
+        )
+    )
+
+
+def cargar_csv_a_snowflake(cursor, csv_path: Path, pais: str, schema: str,
+                           tablas_existentes: Set[str], tmpdir: str) -> Dict:
+    """Carga un archivo CSV normalizado a Snowflake (reutiliza cursor y directorio temporal del país)"""
     logger.info(f"\n{'='*80}")
     logger.info(f"📄 Procesando: {csv_path.name} ({pais})")
     logger.info(f"{'='*80}")
@@ -293,69 +409,127 @@ def cargar_csv_a_snowflake(conn, csv_path: Path, pais: str, schema: str) -> Dict
         logger.info(f"   Nombre tabla destino: {nombre_tabla}")
         
         # Detectar separador automáticamente
-        with open(csv_path, 'r', encoding='utf-8-sig') as f:
-            primera_linea = f.readline()
-            separador = ';' if primera_linea.count(';') > primera_linea.count(',') else ','
-            logger.info(f"   Separador detectado: '{separador}'")
-        
-        df = None
-        
+        # (muestra binaria acotada: sin decodificar texto ni leer headers gigantes)
+        with open(csv_path, 'rb') as f:
+            muestra = f.read(SEPARADOR_SAMPLE_BYTES)
+        primera_linea = muestra.removeprefix(codecs.BOM_UTF8).split(b'\n', 1)[0]
+        separador = ';' if primera_linea.count(b';') > primera_linea.count(b',') else ','
+        logger.info(f"   Separador detectado: '{separador}'")
+        
+        # Leer y convertir a Parquet en una subcarpeta propia de la tabla
+        # (el directorio temporal del país es compartido por cargas paralelas)
+        tabla_dir = os.path.join(tmpdir, nombre_tabla)
+        os.makedirs(tabla_dir, exist_ok=True)
         try:
-            # Pandas (más robusto para CSVs complejos)
-            df_pandas = pd.read_csv(
-                csv_path,
-                sep=separador,
-                encoding='utf-8-sig',
-                on_bad_lines='skip',
-                engine='python',
-                quoting=1
-            )
+            parquet_glob = os.path.join(tabla_dir, f"{nombre_tabla}_*.parquet")
+            stream_path = os.path.join(tabla_dir, f"{nombre_tabla}_stream.parquet")
+            df_pandas = None
+            
+            try:
+                # Polars en streaming: CSV → Parquet sin materializar el DataFrame completo
+                # (sin ignore_errors: un valor que no encaja con el tipo inferido levanta
+                # ComputeError y pasa al fallback, en vez de cargarse como null)
+                lf = pl.scan_csv(
+                    csv_path,
+                    separator=separador,
+                    null_values=["", "NULL", "None", "NaN"],
+                    infer_schema_length=50000,
+                    truncate_ragged_lines=True,
+                    try_parse_dates=False
+                )
+                df_esquema = lf.head(0).collect()
+                
+                logger.info(f"   Convirtiendo a Parquet (streaming con Polars)...")
+                lf.sink_parquet(stream_path, compression="zstd", compression_level=1, statistics=False)
+                
+                # El sink escribe un solo archivo: se reparte por lotes si supera PARQUET_CHUNK_ROWS
+                with pq.ParquetFile(stream_path) as pf:
+                    filas = pf.metadata.num_rows
+                    if filas > PARQUET_CHUNK_ROWS:
+                        partes = escribir_parquet_partes(
+                            pf.iter_batches(batch_size=PARQUET_CHUNK_ROWS),
+                            pf.schema_arrow, tabla_dir, nombre_tabla
+                        )
+                    else:
+                        partes = 1
+                if partes == 1:
+                    os.replace(stream_path, os.path.join(tabla_dir, f"{nombre_tabla}_0000.parquet"))
+                else:
+                    os.remove(stream_path)
+                logger.info(f"   ✓ {partes} archivo(s) Parquet generados")
+                
+            except pl.exceptions.ComputeError as e:
+                logger.warning(f"   Polars falló, intentando PyArrow: {str(e)[:80]}")
+                # Un sink interrumpido deja un Parquet parcial que coincide con parquet_glob
+                # (PUT/COPY y el conteo de EAN lo tomarían junto a las partes del fallback)
+                Path(stream_path).unlink(missing_ok=True)
+                try:
+                    # Lectura directa a Arrow (C++ multihilo), sin copias Pandas/Polars
+                    tabla_arrow = leer_csv_arrow(csv_path, separador)
+                    df_esquema = pl.from_arrow(tabla_arrow.slice(0, 0))
+                    filas = tabla_arrow.num_rows
+                    
+                    logger.info(f"   Convirtiendo a Parquet...")
+                    partes = escribir_parquet_partes(
+                        tabla_arrow.to_batches(max_chunksize=PARQUET_CHUNK_ROWS),
+                        tabla_arrow.schema, tabla_dir, nombre_tabla
+                    )
+                    logger.info(f"   ✓ {partes} archivo(s) Parquet generados")
+                    del tabla_arrow
+                    
+                except pa.ArrowInvalid as e:
+                    # Último recurso: Pandas (más tolerante con CSVs complejos)
+                    logger.warning(f"   PyArrow falló, intentando Pandas: {str(e)[:80]}")
+                    df_pandas = pd.read_csv(
+                        csv_path,
+                        sep=separador,
+                        encoding='utf-8-sig',
+                        on_bad_lines='skip',
+                        engine='python',
+                        quoting=1
+                    )
+                    df_esquema = pl.from_pandas(df_pandas.head(0))
+                    filas = len(df_pandas)
             
-            df = pl.from_pandas(df_pandas)
-            logger.info(f"   ✓ CSV leído con Pandas")
+            stats['filas_leidas'] = filas
+            logger.info(f"   ✓ Leídas {filas:,} filas, {df_esquema.width} columnas")
             
-        except Exception as e:
-            # Fallback a Polars
-            logger.warning(f"   Pandas falló, intentando Polars: {str(e)[:80]}")
-            df = pl.read_csv(
-                csv_path,
-                separator=separador,
-                ignore_errors=True,
-                null_values=["", "NULL", "None", "NaN"],
-                infer_schema_length=50000,
-                truncate_ragged_lines=True,
-                try_parse_dates=False
-            )
-        
-        stats['filas_leidas'] = df.height
-        logger.info(f"   ✓ Leídas {df.height:,} filas, {df.width} columnas")
-        
-        # Verificar columna EAN
-        if 'EAN' in df.columns:
-            ean_count = df.filter(pl.col('EAN').is_not_null() & (pl.col('EAN') != '')).height
-            logger.info(f"   ✓ Columna EAN encontrada ({ean_count:,} valores no vacíos)")
-        
-        if df.is_empty():
-            logger.warning(f"   ⚠️  Archivo vacío, omitiendo carga")
-            return stats
-        
-        # Crear tabla (con backup automático)
-        crear_tabla_snowflake(conn, schema, nombre_tabla, df)
-        
-        # Convertir a Parquet y cargar
-        with tempfile.TemporaryDirectory(prefix="snowflake_load_") as tmpdir:
-            parquet_path = os.path.join(tmpdir, f"{nombre_tabla}.parquet")
+            if filas == 0:
+                logger.warning(f"   ⚠️  Archivo vacío, omitiendo carga")
+                return stats
             
-            logger.info(f"   Convirtiendo a Parquet...")
-            pq.write_table(df.to_arrow(), parquet_path, compression="snappy")
+            # Verificar columna EAN (sobre el Parquet ya escrito, no sobre el CSV)
+            if 'EAN' in df_esquema.columns:
+                if df_pandas is not None:
+                    ean = df_pandas['EAN']
+                    ean_count = int((ean.notna() & (ean.astype(str) != '')).sum())
+                else:
+                    ean_count = (
+                        pl.scan_parquet(parquet_glob)
+                        .filter(pl.col('EAN').is_not_null() & (pl.col('EAN') != ''))
+                        .select(pl.len())
+                        .collect()
+                        .item()
+                    )
+                logger.info(f"   ✓ Columna EAN encontrada ({ean_count:,} valores no vacíos)")
+            
+            # Crear tabla (con backup automático)
+            crear_tabla_snowflake(cursor, schema, nombre_tabla, df_esquema, tablas_existentes)
             
             # Cargar a Snowflake
-            copy_parquet_to_snowflake(conn, schema, nombre_tabla, parquet_path)
-        
-        stats['filas_cargadas'] = df.height
+            if df_pandas is not None:
+                write_pandas_to_snowflake(cursor.connection, schema, nombre_tabla, df_pandas)
+            else:
+                copy_parquet_to_snowflake(cursor, schema, nombre_tabla, tabla_dir)
+        finally:
+            # Borrar solo los Parquet de esta tabla; el directorio se reutiliza
+            for parquet_file in Path(tabla_dir).glob(f"{nombre_tabla}_*.parquet"):
+                parquet_file.unlink()
+        
+        stats['filas_cargadas'] = filas
         stats['exito'] = True
         
-        logger.info(f"✅ ÉXITO: {nombre_tabla} ({df.height:,} filas)\n")
+        logger.info(f"✅ ÉXITO: {nombre_tabla} ({filas:,} filas)\n")
         
     except Exception as e:
         stats['error'] = str(e)
@@ -365,15 +539,23 @@ def cargar_csv_a_snowflake(conn, csv_path: Path, pais: str, schema: str) -> Dict
     return stats
 
 
-def procesar_carpeta_pais(conn, pais: str, base_dir: Path, schema: str) -> List[Dict]:
-    """Procesa todos los archivos normalizados de un país"""
+def listar_archivos_normalizados(pais: str, base_dir: Path) -> List[Path]:
+    """Archivos *_normalizado.csv de un país, ordenados por nombre"""
     pais_dir = base_dir / pais
     
     if not pais_dir.exists():
         logger.warning(f"⚠️  Carpeta no encontrada: {pais_dir}")
         return []
     
-    archivos_normalizados = list(pais_dir.glob("*_normalizado.csv"))
+    # Una sola pasada de scandir con filtro por sufijo (sin stat por entrada en Drive)
+    with os.scandir(pais_dir) as it:
+        archivos_normalizados = sorted(
+            (
+                Path(e.path) for e in it
+                if e.name.endswith("_normalizado.csv") and e.is_file(follow_symlinks=False)
+            ),
+            key=lambda p: p.name
+        )
     
     if not archivos_normalizados:
         logger.info(f"ℹ️  {pais}: No se encontraron archivos normalizados")
@@ -383,13 +565,56 @@ def procesar_carpeta_pais(conn, pais: str, base_dir: Path, schema: str) -> List[
     logger.info(f"# PAÍS: {pais} - {len(archivos_normalizados)} archivos normalizados")
     logger.info(f"{'#'*80}")
     
-    estadisticas = []
+    return archivos_normalizados
+
+
+def cargar_archivos(tareas: List[Tuple[str, Path]], schema: str, tablas_existentes: Set[str]) -> List[Dict]:
+    """
+    Carga los archivos (pais, csv) de todos los países en un solo pool
+    Como máximo MAX_CARGAS_PARALELAS cargas a la vez, cada hilo con su propia conexión
+    """
+    if not tareas:
+        return []
     
-    for csv_path in sorted(archivos_normalizados):
-        stats = cargar_csv_a_snowflake(conn, csv_path, pais, schema)
-        estadisticas.append(stats)
+    # Conexión y cursor por hilo (el conector no es thread-safe entre hilos)
+    local = threading.local()
+    conexiones = []
+    lock = threading.Lock()
     
-    return estadisticas
+    def obtener_cursor():
+        if not hasattr(local, 'cursor'):
+            conn = get_snowflake_connection()
+            with lock:
+                conexiones.append(conn)
+            local.cursor = conn.cursor()
+        return local.cursor
+    
+    try:
+        # Un solo directorio temporal, con una subcarpeta por país
+        with tempfile.TemporaryDirectory(prefix="snowflake_load_") as tmpdir:
+            def cargar(tarea: Tuple[str, Path]) -> Dict:
+                pais, csv_path = tarea
+                CONTEXTO_LOG.pais = pais
+                try:
+                    pais_tmpdir = os.path.join(tmpdir, pais)
+                    os.makedirs(pais_tmpdir, exist_ok=True)
+                    return cargar_csv_a_snowflake(
+                        obtener_cursor(), csv_path, pais, schema, tablas_existentes, pais_tmpdir
+                    )
+                except Exception as e:
+                    # Falla previa a la carga (p. ej. conexión): se registra como error del archivo
+                    logger.error(f"❌ ERROR: {csv_path.name}: {e}")
+                    return {'archivo': csv_path.name, 'pais': pais, 'tabla': None,
+                            'filas_leidas': 0, 'filas_cargadas': 0, 'exito': False, 'error': str(e)}
+                finally:
+                    CONTEXTO_LOG.pais = None
+            
+            max_workers = max(1, min(MAX_CARGAS_PARALELAS, len(tareas)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(cargar, tareas))
+    finally:
+        for conn in conexiones:
+            conn.close()
 
 
 # ============================================================================
@@ -416,17 +641,18 @@ def main():
         sys.exit(1)
     
     try:
-        # Procesar cada país
-        todas_estadisticas = []
-        
-        for pais in PAISES:
-            stats_pais = procesar_carpeta_pais(
-                conn, 
-                pais, 
-                BASE_DIR, 
-                SNOWFLAKE_CONFIG['schema']
-            )
-            todas_estadisticas.extend(stats_pais)
+        # Tablas existentes: una sola consulta para todos los países
+        tablas_existentes = obtener_tablas_existentes(conn, SNOWFLAKE_CONFIG['schema'])
+        logger.info(f"Tablas existentes en schema: {len(tablas_existentes)}")
+        
+        # Archivos de todos los países en un solo pool (PUT/COPY son I/O de red);
+        # executor.map conserva el orden de PAISES para el resumen
+        tareas = [
+            (pais, csv_path)
+            for pais in PAISES
+            for csv_path in listar_archivos_normalizados(pais, BASE_DIR)
+        ]
+        todas_estadisticas = cargar_archivos(tareas, SNOWFLAKE_CONFIG['schema'], tablas_existentes)
         
         # Resumen final
         print("\n" + "=" * 80)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Resolución compartida de la carpeta base de Google Drive Desktop
+Usado por los scripts ETL 2, 3 y 4
+
+Autor: Sistema
+Fecha: 2026-01-22
+"""
+
+import os
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Carpeta por defecto en Drive y fallback local de pruebas
+DRIVE_BASE_DIR_DEFAULT = r"G:\Mi unidad\ETL_Snowflake"
+LOCAL_BASE_DIR = r"C:\Ciencia de Datos\otros_datos"
+
+
+def resolve_base_dir() -> Path:
+    """
+    Devuelve la carpeta base (Drive o local de pruebas)
+    Cada script la resuelve una vez al cargar el módulo, después de configurar logging
+    """
+    drive_base_dir = os.getenv("DRIVE_BASE_DIR", DRIVE_BASE_DIR_DEFAULT)
+    
+    try:
+        os.stat(drive_base_dir)
+        return Path(drive_base_dir)
+    except OSError:
+        logger.warning(f"⚠️  Google Drive no detectado en {drive_base_dir}")
+        logger.info("   Usando carpeta local de pruebas...")
+        return Path(LOCAL_BASE_DIR)
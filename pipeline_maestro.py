@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-PIPELINE MAESTRO - Ejecuta todos los pasos del ETL secuencialmente
+PIPELINE MAESTRO - Ejecuta todos los pasos del ETL
+(pasos 2-3 en paralelo por país, carga a Snowflake al final)
 
 Pasos:
 1. Verificar configuración
@@ -19,8 +20,14 @@ Fecha: 2026-01-22
 
 import os
 import sys
+import functools
+import hashlib
+import importlib.util
 import logging
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -48,13 +55,47 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Pasos que se ejecutan por país en paralelo (normalizar, renombrar)
+PASOS_POR_PAIS = {1, 2}
+
+
+# Variables obligatorias en .env
+VARS_REQUERIDAS = [
+    "DRIVE_BASE_DIR",
+    "PAISES_FOLDERS",
+    "SNOWFLAKE_ACCOUNT",
+    "SNOWFLAKE_USER",
+    "SNOWFLAKE_PASSWORD",
+    "SNOWFLAKE_WAREHOUSE",
+    "SNOWFLAKE_DATABASE",
+    "SNOWFLAKE_SCHEMA"
+]
+
+
+# Vigencia de una verificación exitosa (segundos), ligada al mtime del .env
+VERIFICACION_TTL = 3600
+
+
 # ============================================================================
 # FUNCIONES AUXILIARES
 # ============================================================================
 
+@functools.lru_cache(maxsize=1)
+def get_env_config() -> dict:
+    """Snapshot de las variables requeridas (una sola lectura del entorno por proceso)"""
+    return {var: os.environ.get(var) for var in VARS_REQUERIDAS}
+
+
+def sentinel_verificacion(env_stat: os.stat_result) -> Path:
+    """Archivo marca de verificación OK; cambia si se edita el .env (mtime)"""
+    key = hashlib.sha1(env_stat.st_mtime_ns.to_bytes(8, "little")).hexdigest()
+    return Path(tempfile.gettempdir()) / f"genomma_verify_{key}.ok"
+
+
 def verificar_configuracion() -> bool:
     """
     Verifica que todas las configuraciones necesarias estén presentes
+    Una verificación exitosa se recuerda VERIFICACION_TTL segundos mientras el .env no cambie
     
     Returns:
         True si todo OK, False si falta algo
@@ -64,28 +105,31 @@ def verificar_configuracion() -> bool:
     logger.info("=" * 80)
     
     errores = []
+    sentinel = None
     
     # 1. Verificar .env existe
     env_path = ETL_DIR / ".env"
-    if not env_path.exists():
+    try:
+        env_stat = env_path.stat()
+    except FileNotFoundError:
         errores.append(".env no encontrado. Copia .env.template y configura.")
     else:
         logger.info(f"✓ Archivo .env encontrado")
+        
+        # Verificación reciente con el mismo .env: no repetir chequeos
+        sentinel = sentinel_verificacion(env_stat)
+        try:
+            if time.time() - sentinel.stat().st_mtime < VERIFICACION_TTL:
+                logger.info("✅ CONFIGURACIÓN CORRECTA (verificada hace menos de 1h)")
+                logger.info("=" * 80)
+                return True
+        except FileNotFoundError:
+            pass
     
     # 2. Verificar variables obligatorias
-    vars_requeridas = [
-        "DRIVE_BASE_DIR",
-        "PAISES_FOLDERS",
-        "SNOWFLAKE_ACCOUNT",
-        "SNOWFLAKE_USER",
-        "SNOWFLAKE_PASSWORD",
-        "SNOWFLAKE_WAREHOUSE",
-        "SNOWFLAKE_DATABASE",
-        "SNOWFLAKE_SCHEMA"
-    ]
+    env = get_env_config()
     
-    for var in vars_requeridas:
-        valor = os.getenv(var)
+    for var, valor in env.items():
         if not valor:
             errores.append(f"Variable {var} no configurada en .env")
         else:
@@ -96,19 +140,30 @@ def verificar_configuracion() -> bool:
                 logger.info(f"✓ {var} = {valor}")
     
     # 3. Verificar Google Drive existe
-    drive_dir = Path(os.getenv("DRIVE_BASE_DIR", ""))
+    drive_dir = Path(env["DRIVE_BASE_DIR"] or "")
     if not drive_dir.exists():
         logger.warning(f"⚠️  Google Drive no encontrado en: {drive_dir}")
         logger.warning("   El pipeline usará carpeta local de fallback")
     else:
         logger.info(f"✓ Google Drive detectado: {drive_dir}")
         
-        # Verificar carpetas de países
-        paises = os.getenv("PAISES_FOLDERS", "").split(",")
-        for pais in paises:
-            pais = pais.strip()
-            pais_dir = drive_dir / pais
-            if pais_dir.exists():
+        # Verificar carpetas de países: un solo readdir en vez de un stat por país
+        paises = [p.strip() for p in (env["PAISES_FOLDERS"] or "").split(",")]
+        try:
+            with os.scandir(drive_dir) as it:
+                presentes = {e.name for e in it if e.is_dir()}
+            existencia = [pais in presentes for pais in paises]
+        except OSError:
+            # Fallback: stats concurrentes (en Drive/FUSE cada stat es un round-trip)
+            dirs = [drive_dir / pais for pais in paises]
+            if len(dirs) > 1:
+                with ThreadPoolExecutor(max_workers=min(16, len(dirs))) as executor:
+                    existencia = list(executor.map(Path.exists, dirs))
+            else:
+                existencia = [d.exists() for d in dirs]
+        
+        for pais, existe in zip(paises, existencia):
+            if existe:
                 logger.info(f"  ✓ Carpeta {pais}/ encontrada")
             else:
                 logger.warning(f"  ⚠️  Carpeta {pais}/ NO encontrada")
@@ -118,10 +173,15 @@ def verificar_configuracion() -> bool:
     dependencias = ["polars", "pandas", "pyarrow", "snowflake.connector", "dotenv"]
     
     for dep in dependencias:
+        # find_spec solo ubica el módulo, sin importarlo (pandas/polars/pyarrow son pesados)
         try:
-            __import__(dep)
+            encontrado = importlib.util.find_spec(dep) is not None
+        except ModuleNotFoundError:
+            encontrado = False  # Paquete padre ausente (ej: snowflake)
+        
+        if encontrado:
             logger.info(f"✓ {dep} instalado")
-        except ImportError:
+        else:
             errores.append(f"Dependencia {dep} no instalada. Ejecuta: pip install {dep}")
     
     # Resultado
@@ -135,10 +195,15 @@ def verificar_configuracion() -> bool:
     else:
         logger.info("✅ CONFIGURACIÓN CORRECTA")
         logger.info("=" * 80)
+        if sentinel:
+            try:
+                sentinel.touch()
+            except OSError:
+                pass  # Sin marca solo se repite la verificación
         return True
 
 
-def ejecutar_script(script_path: Path, args: list = None, descripcion: str = "") -> bool:
+def ejecutar_script(script_path: Path, args: list = None, descripcion: str = "", pais: str = None) -> bool:
     """
     Ejecuta un script Python
     
@@ -146,6 +211,7 @@ def ejecutar_script(script_path: Path, args: list = None, descripcion: str = "")
         script_path: Ruta al script
         args: Argumentos adicionales
         descripcion: Descripción del paso
+        pais: Si se especifica, el script procesa solo ese país
     
     Returns:
         True si éxito, False si error
@@ -166,13 +232,17 @@ def ejecutar_script(script_path: Path, args: list = None, descripcion: str = "")
     
     logger.info(f"Comando: {' '.join(cmd)}\n")
     
+    # Los scripts leen PAISES_FOLDERS (load_dotenv no pisa variables ya definidas)
+    env = {**os.environ, "PAISES_FOLDERS": pais} if pais else None
+    
     try:
         # Ejecutar script
         result = subprocess.run(
             cmd,
             cwd=script_path.parent,
             capture_output=False,  # Mostrar output en tiempo real
-            text=True
+            text=True,
+            env=env
         )
         
         if result.returncode == 0:
@@ -238,24 +308,62 @@ def ejecutar_pipeline(dry_run: bool = False, solo_paso: int = None):
         }
     ]
     
-    # Filtrar si solo_paso está definido
-    if solo_paso:
-        pasos = [p for p in pasos if p["num"] == solo_paso]
-        if not pasos:
-            logger.error(f"❌ Paso {solo_paso} no válido. Pasos disponibles: 1-3")
-            sys.exit(1)
+    if solo_paso and solo_paso not in {p["num"] for p in pasos}:
+        logger.error(f"❌ Paso {solo_paso} no válido. Pasos disponibles: 1-3")
+        sys.exit(1)
+    
+    # Filtrado en un solo paso: solo_paso y pasos omitidos en dry-run
+    skip = {3} if dry_run else set()
+    seleccion = [p for p in pasos if solo_paso is None or p["num"] == solo_paso]
+    activos = [p for p in seleccion if p["num"] not in skip]
+    
+    for paso in seleccion:
+        if paso["num"] in skip:
+            logger.info("\n" + "=" * 80)
+            logger.info(f"⏭️  PASO {paso['num']} omitido en modo DRY-RUN")
+            logger.info("=" * 80)
     
     # Ejecutar pasos
     exitosos = 0
     fallidos = 0
     
-    for paso in pasos:
-        if dry_run and paso["num"] == 3:
-            logger.info("\n" + "=" * 80)
-            logger.info(f"⏭️  PASO 3 omitido en modo DRY-RUN")
-            logger.info("=" * 80)
-            continue
-        
+    # Pasos 1-2 son independientes por país: una cadena por país en paralelo
+    paises = [p.strip() for p in (get_env_config()["PAISES_FOLDERS"] or "").split(",") if p.strip()]
+    pasos_por_pais = [p for p in activos if p["num"] in PASOS_POR_PAIS]
+    pasos_globales = [p for p in activos if p["num"] not in PASOS_POR_PAIS]
+    
+    def ejecutar_pasos_pais(pais: str) -> list:
+        """Ejecuta en orden los pasos de un país (renombrar depende de normalizar)"""
+        resultados = []
+        for paso in pasos_por_pais:
+            desc = f"{paso['desc']} [{pais}]" if pais else paso["desc"]
+            exito = ejecutar_script(paso["script"], paso["args"], desc, pais=pais)
+            resultados.append(exito)
+            if not exito:
+                break
+        return resultados
+    
+    if pasos_por_pais:
+        grupos = paises or [None]
+        with ThreadPoolExecutor(max_workers=len(grupos)) as executor:
+            futures = {executor.submit(ejecutar_pasos_pais, pais): pais for pais in grupos}
+            for future in as_completed(futures):
+                pais = futures[future]
+                resultados = future.result()
+                ok = sum(resultados)
+                exitosos += ok
+                fallidos += len(resultados) - ok
+                if pais:
+                    logger.info(f"🌎 {pais}: {ok}/{len(resultados)} pasos OK")
+    
+    # Barrera: la carga a Snowflake recién empieza cuando terminaron todos los países
+    if pasos_globales and fallidos and not dry_run:
+        respuesta = input("\n¿Continuar con siguiente paso? (s/n): ")
+        if respuesta.lower() != 's':
+            logger.warning("Pipeline detenido por usuario")
+            pasos_globales = []
+    
+    for paso in pasos_globales:
         exito = ejecutar_script(
             paso["script"],
             paso["args"],
@@ -268,7 +376,7 @@ def ejecutar_pipeline(dry_run: bool = False, solo_paso: int = None):
             fallidos += 1
             
             # Preguntar si continuar
-            if not dry_run and fallidos < len(pasos):
+            if not dry_run and fallidos < len(activos):
                 respuesta = input("\n¿Continuar con siguiente paso? (s/n): ")
                 if respuesta.lower() != 's':
                     logger.warning("Pipeline detenido por usuario")
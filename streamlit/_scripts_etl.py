@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Ejecución de scripts ETL compartida por las apps Streamlit
+Salida en vivo con memoria constante y watchdog de tiempo máximo
+
+Autor: Sistema
+Fecha: 2026-01-26
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Tiempo máximo por script y líneas de salida retenidas (memoria constante)
+SCRIPT_TIMEOUT = 300  # segundos
+SALIDA_MAX_LINEAS = 200
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def ejecutar_script_streaming(script_path: Path, placeholder, timeout: int = SCRIPT_TIMEOUT) -> tuple:
+    """
+    Ejecuta un script ETL mostrando su salida en el placeholder a medida que se genera
+    Solo retiene las últimas SALIDA_MAX_LINEAS líneas (memoria constante)
+
+    Returns:
+        (returncode, salida retenida)
+
+    Raises:
+        subprocess.TimeoutExpired si el script supera timeout segundos
+    """
+    lineas = deque(maxlen=SALIDA_MAX_LINEAS)
+    inicio = time.monotonic()
+    ultimo_render = 0.0
+
+    with subprocess.Popen(
+        [sys.executable, str(script_path)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"}
+    ) as proc:
+        # Watchdog: un script colgado sin imprimir nada también se corta a tiempo
+        watchdog = threading.Timer(timeout, proc.kill)
+        watchdog.start()
+        try:
+            for linea in proc.stdout:
+                lineas.append(linea.rstrip("\n"))
+
+                # Limitar re-renders del bloque de salida
+                ahora = time.monotonic()
+                if ahora - ultimo_render > 0.25:
+                    placeholder.code("\n".join(lineas), language="text")
+                    ultimo_render = ahora
+
+            returncode = proc.wait()
+        finally:
+            watchdog.cancel()
+
+        if time.monotonic() - inicio >= timeout:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+
+    salida = "\n".join(lineas)
+    if salida:
+        placeholder.code(salida, language="text")
+    return returncode, salida
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Acceso a Snowflake compartido por las apps Streamlit
+Conexión cacheada, ejecución de queries (pandas / Arrow / por lotes) y metadata de tablas
+
+Autor: Sistema
+Fecha: 2026-01-26
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import snowflake.connector
+from snowflake.connector.errors import NotSupportedError
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Por encima de este límite los datos se traen y muestran por páginas de este tamaño
+FILAS_POR_LOTE = 5_000
+
+# Query SQL libre: tope de filas si no trae LIMIT y particiones a partir de las cuales se pide confirmación
+LIMITE_QUERY_LIBRE = 10_000
+UMBRAL_PARTICIONES = 10_000
+ES_SELECT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+TIENE_LIMIT = re.compile(r"\bLIMIT\s+\d+(\s+OFFSET\s+\d+)?\s*$", re.IGNORECASE)
+
+# Tramos SQL que no se reescriben: literales ('' o \' escapan comilla, $$...$$),
+# identificadores entre comillas y comentarios
+TRAMOS_SQL_INTACTOS = re.compile(
+    r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"]|"")*"|\$\$.*?\$\$|--[^\n]*|/\*.*?\*/)""", re.DOTALL
+)
+COLA_SQL = re.compile(r"[\s;]+$")
+
+# Países reconocidos por sufijo del nombre de tabla (TABLA_PAIS); el resto va a OTROS
+PAISES = ["CHILE", "COLOMBIA", "ECUADOR", "PERU"]
+SUFIJO_PAIS = re.compile(r"_(" + "|".join(PAISES) + r")$")
+
+# Tope de opciones del filtro por valores (DISTINCT en Snowflake)
+LIMITE_VALORES_DISTINTOS = 1_000
+
+
+# ============================================================================
+# CONEXIÓN SNOWFLAKE
+# ============================================================================
+
+@st.cache_resource
+def get_snowflake_connection():
+    """
+    Establece conexión con Snowflake
+    
+    Prioridad de configuración:
+    1. st.secrets (Streamlit Cloud)
+    2. Variables de entorno (.env local)
+    """
+    try:
+        # Intentar desde st.secrets primero (Streamlit Cloud)
+        if "snowflake" in st.secrets:
+            config = {
+                "account": st.secrets.snowflake.account,
+                "user": st.secrets.snowflake.user,
+                "password": st.secrets.snowflake.password,
+                "warehouse": st.secrets.snowflake.warehouse,
+                "database": st.secrets.snowflake.database,
+                "schema": st.secrets.snowflake.schema,
+                "role": st.secrets.snowflake.get("role", None)
+            }
+        else:
+            # Fallback a variables de entorno (local)
+            config = {
+                "account": os.getenv("SNOWFLAKE_ACCOUNT"),
+                "user": os.getenv("SNOWFLAKE_USER"),
+                "password": os.getenv("SNOWFLAKE_PASSWORD"),
+                "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE"),
+                "database": os.getenv("SNOWFLAKE_DATABASE", "DEV_LND"),
+                "schema": os.getenv("SNOWFLAKE_SCHEMA", "_SQL_CHI"),
+                "role": os.getenv("SNOWFLAKE_ROLE")
+            }
+        
+        # Validar configuración
+        missing = [k for k, v in config.items() if k != "role" and not v]
+        if missing:
+            return None  # Retornar None en lugar de detener
+        
+        # keep-alive: la sesión no expira en reposo (sin re-handshake TLS + auth)
+        conn = snowflake.connector.connect(
+            **{k: v for k, v in config.items() if v},
+            client_session_keep_alive=True,
+            client_prefetch_threads=4
+        )
+        
+        return conn
+    
+    except Exception:
+        return None  # Retornar None en caso de error
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Pool compartido para lanzar queries independientes en paralelo"""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+@st.cache_resource
+def get_cursores_por_hilo() -> threading.local:
+    """Almacén thread-local de cursores (sobrevive a los reruns del script)"""
+    return threading.local()
+
+
+def get_cursor(conn):
+    """Cursor reutilizable del hilo actual (cada worker del pool tiene el suyo)"""
+    local = get_cursores_por_hilo()
+    if getattr(local, "conn", None) is not conn or local.cursor.is_closed():
+        local.conn = conn
+        local.cursor = conn.cursor()
+    return local.cursor
+
+
+# ============================================================================
+# EJECUCIÓN DE QUERIES
+# ============================================================================
+
+def identificador_sql(nombre: str) -> str:
+    """Identificador entre comillas dobles (respeta mayúsculas, escapa comillas)"""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def ejecutar_query_directo(query: str, params: dict = None) -> pd.DataFrame:
+    """
+    Ejecuta query en Snowflake y retorna DataFrame de Pandas (sin cache)
+    
+    Args:
+        query: SQL query
+        params: Parámetros para query parametrizada
+    
+    Returns:
+        DataFrame con resultados
+    """
+    conn = get_snowflake_connection()
+    
+    if conn is None:
+        return pd.DataFrame()  # Retornar DataFrame vacío si no hay conexión
+    
+    cursor = get_cursor(conn)
+    
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+    
+    # Fetch resultados vía Arrow (sin materializar filas como tuplas Python)
+    # y pandas respaldado por Arrow: strings sin objetos Python, st.dataframe sin reconvertir
+    try:
+        tabla = cursor.fetch_arrow_all()
+        if tabla is None:
+            return pd.DataFrame(columns=[desc[0] for desc in cursor.description])
+        return tabla.to_pandas(types_mapper=pd.ArrowDtype)
+    except NotSupportedError:
+        # SHOW/DESCRIBE devuelven JSON, no Arrow
+        columns = [desc[0] for desc in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def ejecutar_query_batches(query: str, params: dict = None, chunk_size: int = FILAS_POR_LOTE):
+    """
+    Ejecuta query y entrega el resultado en tablas Arrow de ~chunk_size filas
+    Los lotes Arrow del conector se agrupan hasta llegar a chunk_size
+    
+    Yields:
+        pa.Table por lote
+    """
+    conn = get_snowflake_connection()
+    
+    if conn is None:
+        return
+    
+    # Cursor propio: el generador queda abierto mientras el hilo puede lanzar otras queries
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(query, params)
+        
+        pendientes = []
+        filas = 0
+        for lote in cursor.fetch_arrow_batches():
+            pendientes.append(lote)
+            filas += lote.num_rows
+            if filas >= chunk_size:
+                yield pa.concat_tables(pendientes)
+                pendientes = []
+                filas = 0
+        
+        if pendientes:
+            yield pa.concat_tables(pendientes)
+    
+    finally:
+        cursor.close()
+
+
+@st.cache_data(ttl=300, max_entries=64, show_spinner=False)
+def fetch_arrow(query: str, params: dict = None) -> pa.Table:
+    """
+    Ejecuta query y retorna la tabla Arrow del conector, sin pasar por pandas
+    (st.dataframe y el CSV la consumen directo)
+    """
+    conn = get_snowflake_connection()
+    
+    if conn is None:
+        return pa.table({})
+    
+    cursor = get_cursor(conn)
+    cursor.execute(query, params)
+    
+    tabla = cursor.fetch_arrow_all()
+    if tabla is None:
+        return pa.table({desc[0]: pa.array([], pa.null()) for desc in cursor.description})
+    return tabla
+
+
+@st.cache_data(ttl=300, max_entries=64, show_spinner=False)
+def ejecutar_query(query: str, params: dict = None) -> pd.DataFrame:
+    """
+    Versión cacheada de ejecutar_query_directo (clave: query + params)
+    Reruns con el mismo SQL (filtros, tabs) no vuelven a Snowflake
+    """
+    return ejecutar_query_directo(query, params)
+
+
+# ============================================================================
+# METADATA Y CONSULTAS DE TABLAS
+# ============================================================================
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def listar_tablas_por_pais() -> dict:
+    """
+    Lista todas las tablas agrupadas por país
+    Cacheado 30 min (solo el dict final); se invalida con "Refrescar tablas"
+    
+    Returns:
+        Dict: {pais: [lista_de_tablas]}
+    """
+    # SHOW lee la capa de metadata (sin warehouse); INFORMATION_SCHEMA compila y escanea
+    df = ejecutar_query("SHOW TERSE TABLES")
+    nombres = sorted(
+        tabla for tabla in (df["name"].tolist() if not df.empty else [])
+        if not tabla.endswith("_OLD")
+    )
+    
+    # Agrupar por país con un solo match de sufijo por tabla (orden fijo: PAISES + OTROS)
+    tablas_por_pais = {pais: [] for pais in PAISES + ["OTROS"]}
+    
+    for tabla in nombres:
+        match = SUFIJO_PAIS.search(tabla)
+        tablas_por_pais[match.group(1) if match else "OTROS"].append(tabla)
+    
+    # Remover países sin tablas
+    return {k: v for k, v in tablas_por_pais.items() if v}
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def info_tabla(tabla: str) -> tuple:
+    """
+    Filas y columnas de una tabla en una sola query de metadata
+    (dos subqueries escalares: siempre vuelve una fila, sin COUNT(*) sobre la tabla)
+    
+    Returns:
+        (total_filas, total_columnas)
+    """
+    query = """
+    SELECT
+        (SELECT ROW_COUNT FROM INFORMATION_SCHEMA.TABLES
+         WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = %(tabla)s) AS TOTAL_FILAS,
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+         WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = %(tabla)s) AS TOTAL_COLUMNAS
+    """
+    
+    df = ejecutar_query(query, {"tabla": tabla})
+    
+    if df.empty:
+        return 0, 0
+    
+    fila = df.iloc[0]
+    total_filas = fila["TOTAL_FILAS"]
+    total_columnas = 0 if pd.isna(fila["TOTAL_COLUMNAS"]) else int(fila["TOTAL_COLUMNAS"])
+    
+    # Sin ROW_COUNT en metadata (p. ej. tablas transient o vistas): COUNT(*) como respaldo
+    if pd.isna(total_filas) and total_columnas:
+        df_count = ejecutar_query(f"SELECT COUNT(*) AS TOTAL FROM {identificador_sql(tabla)}")
+        total_filas = df_count.iloc[0]["TOTAL"] if not df_count.empty else 0
+    
+    return (0 if pd.isna(total_filas) else int(total_filas)), total_columnas
+
+
+def construir_query_datos(tabla: str, limite: int, columna: str = None, valores: list = None) -> tuple:
+    """
+    Query canónica de datos de una tabla (mismo texto para la misma pregunta)
+    Valores y límite van como parámetros: sin fechas ni literales variables en el SQL,
+    así las repeticiones aciertan en el result cache de Snowflake
+    
+    Returns:
+        (query, params)
+    """
+    params = {"limite": int(limite)}
+    query = f"SELECT * FROM {identificador_sql(tabla)}"
+    
+    if columna and valores:
+        valores_params = {f"v{i}": valor for i, valor in enumerate(valores)}
+        marcadores = ", ".join(f"%({k})s" for k in valores_params)
+        query += f" WHERE {identificador_sql(columna)} IN ({marcadores})"
+        params.update(valores_params)
+    
+    return query + " LIMIT %(limite)s", params
+
+
+def quitar_cola_sql(query: str) -> str:
+    """Quita comentarios, espacios y ';' del final de la query (literales y comentarios internos intactos)"""
+    partes = TRAMOS_SQL_INTACTOS.split(query)
+    # split alterna código (índices pares) y tramos intactos (impares)
+    while partes:
+        ultima = partes[-1]
+        if len(partes) % 2:
+            resto = COLA_SQL.sub("", ultima)
+            if resto:
+                partes[-1] = resto
+                break
+        elif not ultima.startswith(("--", "/*")):
+            break
+        partes.pop()
+    return "".join(partes)
+
+
+def preparar_query_libre(query: str) -> str:
+    """
+    SELECT sin LIMIT final recibe LIMIT LIMITE_QUERY_LIBRE al final
+    Sin subconsulta: se conserva el ORDER BY de la query y un comentario final no se come el cierre
+    """
+    query = quitar_cola_sql(query).strip()
+    if ES_SELECT.match(query) and not TIENE_LIMIT.search(query):
+        return f"{query}\nLIMIT {LIMITE_QUERY_LIBRE}"
+    return query
+
+
+def particiones_estimadas(query: str):
+    """
+    Micro-particiones que escanearía la query según EXPLAIN (solo compila, no ejecuta)
+    
+    Returns:
+        partitionsAssigned del plan, o None si no se pudo estimar
+    """
+    conn = get_snowflake_connection()
+    if conn is None or not ES_SELECT.match(query):
+        return None
+    
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute(f"EXPLAIN USING JSON {query}")
+        plan = json.loads(cursor.fetchone()[0])
+        return plan.get("GlobalStats", {}).get("partitionsAssigned")
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def valores_distintos(tabla: str, columna: str) -> list:
+    """
+    Hasta LIMITE_VALORES_DISTINTOS valores distintos (no nulos) de una columna, resueltos en Snowflake
+    Cache por (tabla, columna); filtro de nulos y orden también en Snowflake
+    """
+    col_sql = identificador_sql(columna)
+    query = f"""
+    SELECT DISTINCT {col_sql} AS VALOR
+    FROM {identificador_sql(tabla)}
+    WHERE {col_sql} IS NOT NULL
+    ORDER BY VALOR
+    LIMIT {LIMITE_VALORES_DISTINTOS}
+    """
+    df = ejecutar_query(query)
+    return df["VALOR"].tolist() if not df.empty else []
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def frecuencias_columna(tabla: str, columna: str) -> pd.DataFrame:
+    """
+    Top 10 valores más frecuentes de una columna sobre la tabla completa
+    APPROX_TOP_K resuelve en una pasada sin ordenar todos los grupos (conteos aproximados);
+    FLATTEN desarma el arreglo [valor, conteo] en filas: retorna solo 10 filas
+    
+    Returns:
+        DataFrame con columnas VAL, FREQ
+    """
+    tabla_sql = identificador_sql(tabla)
+    col_sql = identificador_sql(columna)
+    query = f"""
+    SELECT f.VALUE[0]::STRING AS VAL, f.VALUE[1]::NUMBER AS FREQ
+    FROM (SELECT APPROX_TOP_K({col_sql}, 10) AS TOP_K FROM {tabla_sql}) t,
+         LATERAL FLATTEN(INPUT => t.TOP_K) f
+    ORDER BY FREQ DESC
+    """
+    return ejecutar_query(query)
@@ -9,21 +9,64 @@ Fecha: 2026-01-27
 
 import streamlit as st
 import pandas as pd
+import polars as pl
+import pyarrow as pa
 import snowflake.connector
+from snowflake.connector.errors import NotSupportedError
 from datetime import datetime
+import io
 import os
+import re
+import subprocess
+import threading
 from pathlib import Path
 
+# Quoting de identificadores y tramos SQL intactos compartidos con app_reportes_old
+from _snowflake_db import identificador_sql, TRAMOS_SQL_INTACTOS
+# Ejecución de scripts ETL con salida en vivo, compartida con streamlit_app
+from _scripts_etl import ejecutar_script_streaming
+
 # ============================================================================
 # CONFIGURACIÓN INICIAL
 # ============================================================================
 
 # Cargar variables de entorno
-try:
-    from dotenv import load_dotenv
-    load_dotenv(Path(__file__).parent.parent / "etl" / ".env")
-except:
-    pass
+ENV_PATH = Path(__file__).parent.parent / "etl" / ".env"
+
+
+def aplicar_env(override: bool = False) -> bool:
+    """Copia etl/.env a os.environ (sin pisar variables ya definidas, salvo override)"""
+    try:
+        from dotenv import dotenv_values
+    except ImportError:
+        return False
+    
+    for key, value in dotenv_values(ENV_PATH).items():
+        if value is not None and (override or key not in os.environ):
+            os.environ[key] = value
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def load_env() -> bool:
+    """Parsea .env una sola vez por proceso (no en cada rerun de Streamlit)"""
+    return aplicar_env()
+
+
+load_env()
+
+# Variables Snowflake leídas desde el entorno
+SNOWFLAKE_ENV_VARS = [
+    "SNOWFLAKE_ACCOUNT",
+    "SNOWFLAKE_USER",
+    "SNOWFLAKE_PASSWORD",
+    "SNOWFLAKE_WAREHOUSE",
+    "SNOWFLAKE_DATABASE",
+    "SNOWFLAKE_SCHEMA",
+    "SNOWFLAKE_ROLE",
+]
+
+ESPACIOS = re.compile(r"[ \t]+")
 
 # Configuración de la página
 st.set_page_config(
@@ -68,6 +111,17 @@ st.markdown("""
 # FUNCIONES DE CONEXIÓN
 # ============================================================================
 
+@st.cache_resource
+def get_env_config() -> dict:
+    """Snapshot de variables Snowflake (persiste entre reruns; no modificar)"""
+    return {var: os.environ.get(var) for var in SNOWFLAKE_ENV_VARS}
+
+
+def clear_env_cache():
+    """Invalida el snapshot de entorno (tras editar .env)"""
+    get_env_config.clear()
+
+
 @st.cache_resource
 def get_connection():
     """Establece conexión con Snowflake"""
@@ -86,15 +140,16 @@ def get_connection():
                 config["role"] = st.secrets.snowflake.role
         else:
             # Usar variables de entorno
+            env = get_env_config()
             config = {
-                "account": os.getenv("SNOWFLAKE_ACCOUNT"),
-                "user": os.getenv("SNOWFLAKE_USER"),
-                "password": os.getenv("SNOWFLAKE_PASSWORD"),
-                "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE"),
-                "database": os.getenv("SNOWFLAKE_DATABASE"),
-                "schema": os.getenv("SNOWFLAKE_SCHEMA"),
+                "account": env["SNOWFLAKE_ACCOUNT"],
+                "user": env["SNOWFLAKE_USER"],
+                "password": env["SNOWFLAKE_PASSWORD"],
+                "warehouse": env["SNOWFLAKE_WAREHOUSE"],
+                "database": env["SNOWFLAKE_DATABASE"],
+                "schema": env["SNOWFLAKE_SCHEMA"],
             }
-            role = os.getenv("SNOWFLAKE_ROLE")
+            role = env["SNOWFLAKE_ROLE"]
             if role:
                 config["role"] = role
         
@@ -115,32 +170,128 @@ def get_connection():
         return None
 
 
-@st.cache_data(ttl=300)
-def run_query(query: str):
-    """Ejecuta una query y retorna DataFrame"""
+def filas_a_tabla(columnas: list, filas: list) -> pa.Table:
+    """Construye tabla Arrow desde filas DB-API (columnar, admite 0 filas)"""
+    if not filas:
+        return pa.table({col: [] for col in columnas})
+    return pa.table({col: list(valores) for col, valores in zip(columnas, zip(*filas))})
+
+
+@st.cache_resource
+def get_cursores_por_hilo() -> threading.local:
+    """Almacén thread-local de cursores (sobrevive a los reruns del script)"""
+    return threading.local()
+
+
+def get_cursor():
+    """
+    Cursor reutilizado del hilo actual sobre la conexión cacheada
+    Un cursor no se comparte entre sesiones: cada hilo de script tiene el suyo
+    """
     conn = get_connection()
     if not conn:
-        return pd.DataFrame()
+        return None
+    local = get_cursores_por_hilo()
+    if getattr(local, "conn", None) is not conn or local.cursor.is_closed():
+        local.conn = conn
+        local.cursor = conn.cursor()
+    return local.cursor
+
+
+def run(sql: str, params: tuple = None) -> pa.Table:
+    """Ejecuta sql en el cursor del hilo y retorna tabla Arrow"""
+    cur = get_cursor()
+    cur.execute(sql, params or ())
+    columnas = [col[0] for col in cur.description] if cur.description else []
+    try:
+        # Resultado Arrow directo, sin materializar pandas
+        tabla = cur.fetch_arrow_all()
+        if tabla is None:
+            tabla = filas_a_tabla(columnas, [])
+    except NotSupportedError:
+        # SHOW/DESCRIBE devuelven JSON, no Arrow
+        tabla = filas_a_tabla(columnas, cur.fetchall())
+    return tabla
+
+
+def normalizar_query(query: str) -> str:
+    """
+    Texto canónico de la query: espacios/tabs colapsados y sin ';' final
+    Los saltos de línea se conservan (un comentario -- termina en el salto) y
+    '...', $$...$$, "...", --... y /*...*/ se respetan tal cual
+    """
+    partes = TRAMOS_SQL_INTACTOS.split(query.strip().rstrip(";").strip())
+    return "".join(
+        parte if i % 2 else ESPACIOS.sub(" ", parte)
+        for i, parte in enumerate(partes)
+    )
+
+
+def run_query(query: str, params: tuple = None) -> pa.Table:
+    """
+    Ejecuta una query y retorna tabla Arrow (se convierte a pandas solo donde hace falta)
+    params se enlazan con %s (sin interpolar valores en el SQL); el cache usa (query normalizada, params)
+    """
+    return run_query_normalizada(normalizar_query(query), params)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def run_query_normalizada(query: str, params: tuple = None) -> pa.Table:
+    """Ejecución cacheada: misma query con distinto formato comparte entrada (y result cache)"""
+    if not get_cursor():
+        return pa.table({})
     
     try:
-        df = pd.read_sql(query, conn)
-        return df
+        return run(query, params)
     except Exception as e:
         st.error(f"❌ Error en query: {str(e)}")
-        return pd.DataFrame()
-
-
-@st.cache_data(ttl=300)
-def get_tables():
-    """Obtiene lista de tablas disponibles"""
-    query = """
-    SELECT TABLE_NAME, TABLE_SCHEMA, ROW_COUNT
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_SCHEMA = CURRENT_SCHEMA()
-      AND TABLE_TYPE = 'BASE TABLE'
-    ORDER BY TABLE_NAME
+        return pa.table({})
+
+
+def tabla_a_csv(datos) -> bytes:
+    """
+    CSV UTF-8 escrito por pandas directo a bytes; acepta Arrow o pandas
+    (mismo formato de fechas y booleanos que las descargas de siempre)
     """
-    return run_query(query)
+    if not isinstance(datos, pd.DataFrame):
+        datos = datos.to_pandas()
+    buffer = io.BytesIO()
+    datos.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+
+@st.cache_data(ttl=900)
+def get_tables(database: str, schema: str) -> pa.Table:
+    """
+    Obtiene lista de tablas del schema (cache por database/schema)
+    SHOW TABLES es solo metadata: no compila ni usa warehouse como INFORMATION_SCHEMA
+    """
+    vacia = filas_a_tabla(["TABLE_NAME", "TABLE_SCHEMA", "ROW_COUNT"], [])
+    cur = get_cursor()
+    if not cur or not database or not schema:
+        return vacia
+    
+    try:
+        db_ident = identificador_sql(database)
+        schema_ident = identificador_sql(schema)
+        cur.execute(f"SHOW TABLES IN SCHEMA {db_ident}.{schema_ident}")
+        idx = {col[0].lower(): i for i, col in enumerate(cur.description)}
+        filas = sorted(
+            (fila[idx["name"]], fila[idx["schema_name"]], fila[idx["rows"]])
+            for fila in cur.fetchall()
+        )
+        return filas_a_tabla(["TABLE_NAME", "TABLE_SCHEMA", "ROW_COUNT"], filas)
+    except Exception as e:
+        st.error(f"❌ Error listando tablas: {str(e)}")
+        return vacia
+
+
+def stat_o_none(path: Path):
+    """Un solo stat: resultado si existe, None si no (en vez de exists() + stat())"""
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
 
 
 # ============================================================================
@@ -161,12 +312,15 @@ with st.sidebar:
     st.markdown("### 🔌 Conexión")
     
     conn = get_connection()
+    db_actual = schema_actual = None
     if conn:
         st.success("✅ Conectado")
         try:
-            test_df = pd.read_sql("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()", conn)
-            st.caption(f"**DB:** {test_df.iloc[0, 0]}")
-            st.caption(f"**Schema:** {test_df.iloc[0, 1]}")
+            db_actual, schema_actual = get_cursor().execute(
+                "SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()"
+            ).fetchone()
+            st.caption(f"**DB:** {db_actual}")
+            st.caption(f"**Schema:** {schema_actual}")
         except:
             pass
     else:
@@ -203,10 +357,10 @@ if page == "🏠 Inicio":
         st.markdown("---")
         st.markdown("### 📋 Tablas Disponibles")
         
-        tables_df = get_tables()
+        tables_df = get_tables(db_actual, schema_actual)
         
-        if not tables_df.empty:
-            st.metric("Total de tablas", len(tables_df))
+        if tables_df.num_rows > 0:
+            st.metric("Total de tablas", tables_df.num_rows)
             
             with st.expander("Ver lista completa"):
                 st.dataframe(tables_df, use_container_width=True, hide_index=True)
@@ -228,9 +382,9 @@ elif page == "📊 Explorar Datos":
         st.stop()
     
     # Obtener tablas
-    tables_df = get_tables()
+    tables_df = get_tables(db_actual, schema_actual)
     
-    if tables_df.empty:
+    if tables_df.num_rows == 0:
         st.warning("⚠️ No hay tablas disponibles")
         st.stop()
     
@@ -240,7 +394,7 @@ elif page == "📊 Explorar Datos":
     with col1:
         selected_table = st.selectbox(
             "Selecciona una tabla:",
-            options=tables_df['TABLE_NAME'].tolist()
+            options=tables_df.column('TABLE_NAME').to_pylist()
         )
     
     with col2:
@@ -254,16 +408,17 @@ elif page == "📊 Explorar Datos":
     
     if st.button("📥 Cargar Datos", type="primary"):
         with st.spinner("Cargando datos..."):
-            query = f'SELECT * FROM "{selected_table}" LIMIT {limit}'
-            df = run_query(query)
+            # Tabla vía IDENTIFIER (entre comillas: respeta mayúsculas) y límite enlazado
+            tabla_ident = identificador_sql(selected_table)
+            df = run_query("SELECT * FROM IDENTIFIER(%s) LIMIT %s", (tabla_ident, int(limit)))
         
-        if not df.empty:
-            st.success(f"✅ {len(df)} filas cargadas")
+        if df.num_rows > 0:
+            st.success(f"✅ {df.num_rows} filas cargadas")
             
             # Información de la tabla
             col1, col2, col3 = st.columns(3)
-            col1.metric("Filas", len(df))
-            col2.metric("Columnas", len(df.columns))
+            col1.metric("Filas", df.num_rows)
+            col2.metric("Columnas", df.num_columns)
             col3.metric("Última carga", datetime.now().strftime("%H:%M:%S"))
             
             # Tabs
@@ -272,7 +427,7 @@ elif page == "📊 Explorar Datos":
             with tab1:
                 st.dataframe(df, use_container_width=True, height=500)
                 
-                csv = df.to_csv(index=False).encode('utf-8')
+                csv = tabla_a_csv(df)
                 st.download_button(
                     "📥 Descargar CSV",
                     csv,
@@ -281,21 +436,36 @@ elif page == "📊 Explorar Datos":
                 )
             
             with tab2:
-                cols_num = df.select_dtypes(include=['int64', 'float64']).columns
-                if len(cols_num) > 0:
-                    st.dataframe(df[cols_num].describe(), use_container_width=True)
+                # Columnas numéricas por tipo Arrow (enteros de cualquier ancho, float, NUMBER con escala)
+                cols_num = {}
+                for campo in df.schema:
+                    if pa.types.is_integer(campo.type) or pa.types.is_floating(campo.type):
+                        cols_num[campo.name] = df.column(campo.name)
+                    elif pa.types.is_decimal(campo.type):
+                        cols_num[campo.name] = df.column(campo.name).cast(pa.float64())
+                
+                if cols_num:
+                    # describe() necesita pandas: solo se convierten las columnas numéricas
+                    st.dataframe(pa.table(cols_num).to_pandas().describe(), use_container_width=True)
                 else:
                     st.info("No hay columnas numéricas")
             
             with tab3:
-                if len(df.columns) > 0:
-                    col_filter = st.selectbox("Columna:", df.columns)
-                    unique_vals = df[col_filter].unique()[:100]
+                if df.num_columns > 0:
+                    df_pl = pl.from_arrow(df)
+                    col_filter = st.selectbox("Columna:", df.column_names)
+                    # DISTINCT resuelto en Snowflake (cache por tabla/columna vía run_query)
+                    col_ident = identificador_sql(col_filter)
+                    distintos = run_query(
+                        "SELECT DISTINCT IDENTIFIER(%s) FROM IDENTIFIER(%s) LIMIT 100",
+                        (col_ident, tabla_ident)
+                    )
+                    unique_vals = distintos.column(0).to_pylist() if distintos.num_columns else []
                     
                     values = st.multiselect("Valores:", unique_vals)
                     if values:
-                        filtered = df[df[col_filter].isin(values)]
-                        st.dataframe(filtered, use_container_width=True)
+                        filtered = df_pl.filter(pl.col(col_filter).is_in(values))
+                        st.dataframe(filtered.to_arrow(), use_container_width=True)
         else:
             st.warning("La tabla está vacía")
 
@@ -324,11 +494,11 @@ elif page == "🔍 Query SQL":
             with st.spinner("Ejecutando..."):
                 df = run_query(query)
             
-            if not df.empty:
-                st.success(f"✅ {len(df)} filas × {len(df.columns)} columnas")
+            if df.num_rows > 0:
+                st.success(f"✅ {df.num_rows} filas × {df.num_columns} columnas")
                 st.dataframe(df, use_container_width=True, height=500)
                 
-                csv = df.to_csv(index=False).encode('utf-8')
+                csv = tabla_a_csv(df)
                 st.download_button(
                     "📥 Descargar Resultados",
                     csv,
@@ -400,29 +570,25 @@ elif page == "🔧 Pipeline ETL":
             progress_bar = st.progress(0)
             status_placeholder = st.empty()
             
-            import subprocess
-            
             for i, script in enumerate(scripts):
                 status_placeholder.info(f"🔄 Ejecutando: {script['icon']} {script['name']}")
                 progress_bar.progress((i) / len(scripts))
                 
                 script_path = Path(__file__).parent.parent / "etl" / script["file"]
                 
+                with st.expander(f"Ver salida de {script['name']}"):
+                    salida_placeholder = st.empty()
+                
                 try:
-                    result = subprocess.run(
-                        ["python3", str(script_path)],
-                        capture_output=True,
-                        text=True,
-                        timeout=300
-                    )
+                    returncode, salida = ejecutar_script_streaming(script_path, salida_placeholder)
                     
-                    if result.returncode == 0:
+                    if returncode == 0:
                         status_placeholder.success(f"✅ {script['name']} completado")
-                        with st.expander(f"Ver salida de {script['name']}"):
-                            st.code(result.stdout if result.stdout else "Sin salida")
+                        if not salida:
+                            salida_placeholder.code("Sin salida")
                     else:
                         status_placeholder.error(f"❌ Error en {script['name']}")
-                        st.error(result.stderr if result.stderr else "Error desconocido")
+                        st.error(f"Exit code: {returncode} (ver salida)")
                         break
                         
                 except subprocess.TimeoutExpired:
@@ -453,24 +619,16 @@ elif page == "🔧 Pipeline ETL":
                         script_path = Path(__file__).parent.parent / "etl" / script["file"]
                         
                         with st.spinner(f"Ejecutando {script['name']}..."):
-                            import subprocess
+                            status_placeholder = st.empty()
+                            salida_placeholder = st.empty()
                             
                             try:
-                                result = subprocess.run(
-                                    ["python3", str(script_path)],
-                                    capture_output=True,
-                                    text=True,
-                                    timeout=300
-                                )
+                                returncode, _ = ejecutar_script_streaming(script_path, salida_placeholder)
                                 
-                                if result.returncode == 0:
-                                    st.success(f"✅ {script['name']} completado")
-                                    if result.stdout:
-                                        st.code(result.stdout, language="text")
+                                if returncode == 0:
+                                    status_placeholder.success(f"✅ {script['name']} completado")
                                 else:
-                                    st.error(f"❌ Error en {script['name']}")
-                                    if result.stderr:
-                                        st.code(result.stderr, language="text")
+                                    status_placeholder.error(f"❌ Error en {script['name']}")
                             
                             except subprocess.TimeoutExpired:
                                 st.error(f"❌ Tiempo de ejecución excedido (5 min)")
@@ -480,11 +638,12 @@ elif page == "🔧 Pipeline ETL":
     with tab2:
         st.markdown("### 📊 Estado de Scripts")
         
-        # Verificar existencia de scripts
+        # Verificar existencia de scripts (un stat por script)
         etl_dir = Path(__file__).parent.parent / "etl"
+        stats = {s["file"]: stat_o_none(etl_dir / s["file"]) for s in scripts}
         
         for script in scripts:
-            script_path = etl_dir / script["file"]
+            stat = stats[script["file"]]
             
             col1, col2, col3 = st.columns([3, 1, 1])
             
@@ -492,14 +651,14 @@ elif page == "🔧 Pipeline ETL":
                 st.markdown(f"**{script['icon']} {script['name']}**")
             
             with col2:
-                if script_path.exists():
+                if stat:
                     st.success("✅ Existe")
                 else:
                     st.error("❌ No encontrado")
             
             with col3:
-                if script_path.exists():
-                    size_kb = script_path.stat().st_size / 1024
+                if stat:
+                    size_kb = stat.st_size / 1024
                     st.caption(f"{size_kb:.1f} KB")
 
 # ============================================================================
@@ -511,32 +670,39 @@ elif page == "⚙️ Configuración":
     
     st.markdown("### 📋 Estado de Conexión")
     
+    env = get_env_config()
+    
+    if st.button("🔄 Recargar .env"):
+        aplicar_env(override=True)
+        clear_env_cache()
+        get_connection.clear()
+        st.rerun()
+    
     if conn:
         st.success("✅ Conexión establecida")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Account", os.getenv("SNOWFLAKE_ACCOUNT", "N/A"))
-            st.metric("User", os.getenv("SNOWFLAKE_USER", "N/A"))
-            st.metric("Warehouse", os.getenv("SNOWFLAKE_WAREHOUSE", "N/A"))
+            st.metric("Account", env["SNOWFLAKE_ACCOUNT"] or "N/A")
+            st.metric("User", env["SNOWFLAKE_USER"] or "N/A")
+            st.metric("Warehouse", env["SNOWFLAKE_WAREHOUSE"] or "N/A")
         
         with col2:
-            st.metric("Database", os.getenv("SNOWFLAKE_DATABASE", "N/A"))
-            st.metric("Schema", os.getenv("SNOWFLAKE_SCHEMA", "N/A"))
-            st.metric("Role", os.getenv("SNOWFLAKE_ROLE", "N/A"))
+            st.metric("Database", env["SNOWFLAKE_DATABASE"] or "N/A")
+            st.metric("Schema", env["SNOWFLAKE_SCHEMA"] or "N/A")
+            st.metric("Role", env["SNOWFLAKE_ROLE"] or "N/A")
         
         if st.button("🔄 Probar Conexión"):
             try:
-                test_df = pd.read_sql(
-                    "SELECT CURRENT_USER(), CURRENT_DATABASE(), CURRENT_SCHEMA()",
-                    conn
-                )
+                fila = get_cursor().execute(
+                    "SELECT CURRENT_USER(), CURRENT_DATABASE(), CURRENT_SCHEMA()"
+                ).fetchone()
                 st.success("✅ Conexión funcionando")
                 st.json({
-                    "Usuario": test_df.iloc[0, 0],
-                    "Database": test_df.iloc[0, 1],
-                    "Schema": test_df.iloc[0, 2]
+                    "Usuario": fila[0],
+                    "Database": fila[1],
+                    "Schema": fila[2]
                 })
             except Exception as e:
                 st.error(f"❌ Error: {e}")
@@ -563,12 +729,12 @@ elif page == "⚙️ Configuración":
         
         with st.expander("🔍 Diagnóstico"):
             config = {
-                "SNOWFLAKE_ACCOUNT": os.getenv("SNOWFLAKE_ACCOUNT", "❌ NO CONFIG"),
-                "SNOWFLAKE_USER": os.getenv("SNOWFLAKE_USER", "❌ NO CONFIG"),
-                "SNOWFLAKE_PASSWORD": "✅ OK" if os.getenv("SNOWFLAKE_PASSWORD") else "❌ NO CONFIG",
-                "SNOWFLAKE_WAREHOUSE": os.getenv("SNOWFLAKE_WAREHOUSE", "❌ NO CONFIG"),
-                "SNOWFLAKE_DATABASE": os.getenv("SNOWFLAKE_DATABASE", "❌ NO CONFIG"),
-                "SNOWFLAKE_SCHEMA": os.getenv("SNOWFLAKE_SCHEMA", "❌ NO CONFIG"),
+                "SNOWFLAKE_ACCOUNT": env["SNOWFLAKE_ACCOUNT"] or "❌ NO CONFIG",
+                "SNOWFLAKE_USER": env["SNOWFLAKE_USER"] or "❌ NO CONFIG",
+                "SNOWFLAKE_PASSWORD": "✅ OK" if env["SNOWFLAKE_PASSWORD"] else "❌ NO CONFIG",
+                "SNOWFLAKE_WAREHOUSE": env["SNOWFLAKE_WAREHOUSE"] or "❌ NO CONFIG",
+                "SNOWFLAKE_DATABASE": env["SNOWFLAKE_DATABASE"] or "❌ NO CONFIG",
+                "SNOWFLAKE_SCHEMA": env["SNOWFLAKE_SCHEMA"] or "❌ NO CONFIG",
             }
             
             for key, val in config.items():
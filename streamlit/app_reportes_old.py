@@ -14,18 +14,54 @@ Fecha: 2026-01-26
 
 import streamlit as st
 import pandas as pd
-import snowflake.connector
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
+import io
 import os
 from pathlib import Path
 
+# Capa Snowflake compartida (conexión, queries y metadata)
+from _snowflake_db import (
+    FILAS_POR_LOTE,
+    LIMITE_QUERY_LIBRE,
+    UMBRAL_PARTICIONES,
+    construir_query_datos,
+    ejecutar_query,
+    ejecutar_query_batches,
+    ejecutar_query_directo,
+    fetch_arrow,
+    frecuencias_columna,
+    get_executor,
+    get_snowflake_connection,
+    info_tabla,
+    listar_tablas_por_pais,
+    particiones_estimadas,
+    preparar_query_libre,
+    valores_distintos,
+)
+
+# Ubicación del .env local (calculada una vez)
+ENV_PATH = Path(__file__).parent.parent / "etl" / ".env"
+
 # Intentar cargar .env si existe (local)
 try:
     from dotenv import load_dotenv
-    load_dotenv(Path(__file__).parent.parent / "etl" / ".env")
+    load_dotenv(ENV_PATH)
 except:
     pass
 
+VARIABLES_SNOWFLAKE = [
+    "SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "SNOWFLAKE_WAREHOUSE",
+    "SNOWFLAKE_DATABASE", "SNOWFLAKE_SCHEMA", "SNOWFLAKE_ROLE"
+]
+
+
+@st.cache_resource
+def env_snapshot() -> dict:
+    """Variables SNOWFLAKE_* definidas al iniciar el proceso (el .env se lee una sola vez)"""
+    return {k: os.environ[k] for k in VARIABLES_SNOWFLAKE if k in os.environ}
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -37,214 +73,146 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS Personalizado
-st.markdown("""
-<style>
-    /* Sidebar mejorado */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #1e3c72 0%, #2a5298 100%);
-    }
-    
-    [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] {
-        color: white;
-    }
-    
-    /* Radio buttons en sidebar */
-    [data-testid="stSidebar"] .stRadio > label {
-        color: white !important;
-        font-weight: 600;
-        font-size: 1rem;
-    }
-    
-    [data-testid="stSidebar"] .stRadio > div {
-        background-color: rgba(255, 255, 255, 0.1);
-        padding: 0.5rem;
-        border-radius: 8px;
-    }
-    
-    [data-testid="stSidebar"] .stRadio label[data-baseweb="radio"] {
-        background-color: rgba(255, 255, 255, 0.15);
-        padding: 0.8rem 1rem;
-        border-radius: 8px;
-        margin-bottom: 0.5rem;
-        transition: all 0.3s ease;
-    }
-    
-    [data-testid="stSidebar"] .stRadio label[data-baseweb="radio"]:hover {
-        background-color: rgba(255, 255, 255, 0.25);
-        transform: translateX(5px);
-    }
-    
-    /* Header principal */
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1f77b4;
-        text-align: center;
-        padding: 1rem 0;
-        border-bottom: 3px solid #1f77b4;
-        margin-bottom: 2rem;
-    }
-    
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding-left: 20px;
-        padding-right: 20px;
-        background-color: #f0f2f6;
-        border-radius: 5px 5px 0 0;
-        font-weight: 500;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background-color: #1f77b4;
-        color: white;
-    }
-    
-    /* Botones mejorados */
-    .stButton > button {
-        width: 100%;
-        border-radius: 8px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-    }
-</style>
-""", unsafe_allow_html=True)
+# Snapshot de configuración: sin os.getenv por widget en cada rerun
+env = env_snapshot()
+
+# CSS Personalizado (archivo estático, leído una vez por proceso)
+@st.cache_data(show_spinner=False)
+def load_css() -> str:
+    """Contenido de static/styles.css"""
+    return (Path(__file__).parent / "static" / "styles.css").read_text(encoding="utf-8")
+
+
+# Se inyecta en cada rerun: Streamlit descarta los elementos que un rerun no vuelve a emitir
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # ============================================================================
-# CONEXIÓN SNOWFLAKE
+# UTILIDADES DE DATOS
 # ============================================================================
 
-@st.cache_resource
-def get_snowflake_connection():
-    """
-    Establece conexión con Snowflake
-    
-    Prioridad de configuración:
-    1. st.secrets (Streamlit Cloud)
-    2. Variables de entorno (.env local)
-    """
+# st.fragment (1.37+) / experimental_fragment (1.33+); en versiones previas, función normal
+fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+
+def cargar_pagina():
+    """Trae la siguiente página del resultado paginado en curso (session_state)"""
+    paginacion = st.session_state.get("paginacion")
+    if not paginacion or paginacion["completo"]:
+        return
     try:
-        # Intentar desde st.secrets primero (Streamlit Cloud)
-        if "snowflake" in st.secrets:
-            config = {
-                "account": st.secrets.snowflake.account,
-                "user": st.secrets.snowflake.user,
-                "password": st.secrets.snowflake.password,
-                "warehouse": st.secrets.snowflake.warehouse,
-                "database": st.secrets.snowflake.database,
-                "schema": st.secrets.snowflake.schema,
-                "role": st.secrets.snowflake.get("role", None)
-            }
-        else:
-            # Fallback a variables de entorno (local)
-            config = {
-                "account": os.getenv("SNOWFLAKE_ACCOUNT"),
-                "user": os.getenv("SNOWFLAKE_USER"),
-                "password": os.getenv("SNOWFLAKE_PASSWORD"),
-                "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE"),
-                "database": os.getenv("SNOWFLAKE_DATABASE", "DEV_LND"),
-                "schema": os.getenv("SNOWFLAKE_SCHEMA", "_SQL_CHI"),
-                "role": os.getenv("SNOWFLAKE_ROLE")
-            }
-        
-        # Validar configuración
-        missing = [k for k, v in config.items() if k != "role" and not v]
-        if missing:
-            return None  # Retornar None en lugar de detener
-        
-        conn = snowflake.connector.connect(**{k: v for k, v in config.items() if v})
-        
-        return conn
-    
-    except Exception as e:
-        return None  # Retornar None en caso de error
+        paginacion["paginas"].append(next(paginacion["lotes"]))
+    except StopIteration:
+        paginacion["completo"] = True
 
 
-def ejecutar_query(query: str, params: dict = None) -> pd.DataFrame:
+def df_a_csv(datos) -> bytes:
     """
-    Ejecuta query en Snowflake y retorna DataFrame de Pandas
-    
-    Args:
-        query: SQL query
-        params: Parámetros para query parametrizada
-    
-    Returns:
-        DataFrame con resultados
+    CSV para descarga escrito por pandas directo a bytes, sin str intermedio
+    utf-8-sig: BOM para que Excel detecte la codificación (mismo formato que las otras apps)
+    Acepta tabla Arrow o DataFrame
     """
-    conn = get_snowflake_connection()
-    
-    if conn is None:
-        return pd.DataFrame()  # Retornar DataFrame vacío si no hay conexión
-    
-    cursor = conn.cursor()
-    
-    try:
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        # Fetch resultados
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        
-        df = pd.DataFrame(rows, columns=columns)
-        return df
-    
-    finally:
-        cursor.close()
+    if not isinstance(datos, pd.DataFrame):
+        datos = datos.to_pandas()
+    buffer = io.BytesIO()
+    datos.to_csv(buffer, index=False, encoding='utf-8-sig')
+    return buffer.getvalue()
+
 
+def df_a_parquet(datos) -> bytes:
+    """Parquet (snappy) para descarga: columnar y comprimido, mucho menor que el CSV"""
+    if isinstance(datos, pd.DataFrame):
+        datos = pa.Table.from_pandas(datos, preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(datos, buffer, compression="snappy")
+    return buffer.getvalue()
 
-def listar_tablas_por_pais() -> dict:
+
+def describir_numericas(datos, columnas: list) -> pd.DataFrame:
+    """describe() de las columnas numéricas; solo esas columnas pasan a pandas"""
+    if isinstance(datos, pd.DataFrame):
+        datos = pa.Table.from_pandas(datos[columnas], preserve_index=False)
+    
+    numericas = {}
+    for nombre in columnas:
+        columna = datos.column(nombre)
+        # NUMBER con escala llega como decimal: a float para describe()
+        numericas[nombre] = columna.cast(pa.float64()) if pa.types.is_decimal(columna.type) else columna
+    return pa.table(numericas).to_pandas().describe()
+
+
+@st.cache_data(
+    show_spinner=False,
+    hash_funcs={pd.DataFrame: lambda d: (tuple(d.columns), tuple(map(str, d.dtypes)))}
+)
+def clasificar_columnas(df: pd.DataFrame) -> tuple:
     """
-    Lista todas las tablas agrupadas por país
+    Columnas de texto y numéricas del DataFrame
+    El cache se indexa solo por el esquema (nombres + dtypes), no por las filas;
+    admite cualquier ancho numérico (Int8..Int64, Float32) y strings Arrow
     
     Returns:
-        Dict: {pais: [lista_de_tablas]}
+        (columnas_texto, columnas_numericas)
     """
-    query = """
-    SELECT TABLE_NAME
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_SCHEMA = CURRENT_SCHEMA()
-      AND TABLE_TYPE = 'BASE TABLE'
-      AND TABLE_NAME NOT LIKE '%_OLD'
-    ORDER BY TABLE_NAME
+    texto = []
+    numericas = []
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(dtype):
+            numericas.append(col)
+        elif pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
+            texto.append(col)
+    return texto, numericas
+
+
+@fragmento
+def analisis_rapido(tabla: str, df, columnas_numericas: list, columnas: list):
     """
+    Análisis rápido de la tabla cargada (estadísticas o frecuencias)
+    Como fragmento, cambiar de vista o de columna re-ejecuta solo este bloque
+    """
+    # Solo se calcula la vista activa (st.tabs ejecuta todas, incluida la query de frecuencias)
+    analisis_activo = st.radio(
+        "Análisis:",
+        ["📈 Estadísticas", "📊 ~Frecuencias"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="analisis_activo"
+    )
     
-    df = ejecutar_query(query)
-    
-    # Agrupar por país (asumiendo que las tablas terminan en _PAIS)
-    tablas_por_pais = {
-        "CHILE": [],
-        "COLOMBIA": [],
-        "ECUADOR": [],
-        "PERU": [],
-        "OTROS": []
-    }
-    
-    for tabla in df["TABLE_NAME"].tolist():
-        asignado = False
-        for pais in ["CHILE", "COLOMBIA", "ECUADOR", "PERU"]:
-            if tabla.endswith(f"_{pais}"):
-                tablas_por_pais[pais].append(tabla)
-                asignado = True
-                break
-        
-        if not asignado:
-            tablas_por_pais["OTROS"].append(tabla)
-    
-    # Remover países sin tablas
-    return {k: v for k, v in tablas_por_pais.items() if v}
+    if analisis_activo == "📈 Estadísticas":
+        if columnas_numericas:
+            st.dataframe(describir_numericas(df, columnas_numericas), use_container_width=True)
+        else:
+            st.info("No hay columnas numéricas para analizar")
+    
+    elif analisis_activo == "📊 ~Frecuencias":
+        if columnas:
+            col_analisis = st.selectbox(
+                "Selecciona columna:",
+                options=columnas
+            )
+            
+            if col_analisis:
+                # Frecuencias (aproximadas) sobre la tabla completa, no sobre la muestra cargada
+                top_valores = frecuencias_columna(tabla, col_analisis)
+                
+                if top_valores.empty:
+                    st.info("Sin datos para la columna seleccionada")
+                else:
+                    col1, col2 = st.columns([2, 1])
+                    
+                    with col1:
+                        st.bar_chart(top_valores.set_index("VAL")["FREQ"])
+                    
+                    with col2:
+                        st.dataframe(
+                            top_valores.rename(columns={"VAL": col_analisis, "FREQ": "~Frecuencia"}),
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    
+                    st.caption("ℹ️ Conteos aproximados (APPROX_TOP_K): pueden diferir levemente de un COUNT exacto")
 
 
 # ============================================================================
@@ -285,9 +253,17 @@ with st.sidebar:
     
     if conn is not None:
         st.success("✅ **Conectado**")
-        st.markdown(f"**🗄️ DB:** `{os.getenv('SNOWFLAKE_DATABASE', 'N/A')}`")
-        st.markdown(f"**📂 Schema:** `{os.getenv('SNOWFLAKE_SCHEMA', 'N/A')}`")
-        st.markdown(f"**👤 User:** `{os.getenv('SNOWFLAKE_USER', 'N/A')}`")
+        st.markdown(f"**🗄️ DB:** `{env.get('SNOWFLAKE_DATABASE', 'N/A')}`")
+        st.markdown(f"**📂 Schema:** `{env.get('SNOWFLAKE_SCHEMA', 'N/A')}`")
+        st.markdown(f"**👤 User:** `{env.get('SNOWFLAKE_USER', 'N/A')}`")
+        
+        if st.button("🔄 Refrescar tablas"):
+            listar_tablas_por_pais.clear()
+        
+        if st.button("🔄 Refrescar datos"):
+            ejecutar_query.clear()
+            fetch_arrow.clear()
+            info_tabla.clear()
     else:
         st.error("❌ **Sin conexión**")
         st.markdown("👉 Ve a **⚙️ Configuración**")
@@ -454,21 +430,29 @@ elif menu_option == "📊 Consultar Datos":
     cargar_datos = auto_cargar or st.button("▶️ Cargar Datos", type="primary")
     
     if cargar_datos:
+        # Metadata y datos en paralelo: espera max(query) en lugar de la suma
+        executor = get_executor()
+        query_data, params_data = construir_query_datos(tabla_seleccionada, limite_filas)
+        # Límites grandes se paginan: la primera página llega sin esperar el resto
+        por_lotes = limite_filas > FILAS_POR_LOTE
+        futuro_datos = None if por_lotes else executor.submit(fetch_arrow, query_data, params_data)
+        futuro_info = executor.submit(info_tabla, tabla_seleccionada) if mostrar_info else None
+        
         # Estadísticas de tabla
         if mostrar_info:
             st.markdown("### 📈 Información de la Tabla")
             col1, col2, col3 = st.columns(3)
             
+            total_filas, total_cols = futuro_info.result()
+            
+            # Si el SELECT no llegó al LIMIT, trajo la tabla entera: su largo es el total exacto
+            if futuro_datos is not None and futuro_datos.result().num_rows < limite_filas:
+                total_filas = futuro_datos.result().num_rows
+            
             with col1:
-                query_count = f'SELECT COUNT(*) AS TOTAL FROM "{tabla_seleccionada}"'
-                df_count = ejecutar_query(query_count)
-                total_filas = df_count["TOTAL"].iloc[0] if not df_count.empty else 0
                 st.metric("📊 Total Filas", f"{total_filas:,}")
             
             with col2:
-                query_cols = f"SELECT COUNT(*) AS TOTAL FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{tabla_seleccionada}'"
-                df_cols = ejecutar_query(query_cols)
-                total_cols = df_cols["TOTAL"].iloc[0] if not df_cols.empty else 0
                 st.metric("📋 Total Columnas", f"{total_cols:,}")
             
             with col3:
@@ -479,87 +463,138 @@ elif menu_option == "📊 Consultar Datos":
         # Cargar datos
         st.markdown(f"### 📄 Datos de `{tabla_seleccionada}`")
         
-        query_data = f'SELECT * FROM "{tabla_seleccionada}" LIMIT {limite_filas}'
-        
         with st.spinner(f"⏳ Cargando {limite_filas:,} filas..."):
-            df = ejecutar_query(query_data)
+            if por_lotes:
+                # El cursor abierto queda en session_state: "Cargar más" continúa el mismo resultado
+                clave = (query_data, tuple(sorted(params_data.items())))
+                paginacion = st.session_state.get("paginacion")
+                if not paginacion or paginacion["clave"] != clave:
+                    paginacion = {
+                        "clave": clave,
+                        "lotes": ejecutar_query_batches(query_data, params_data),
+                        "paginas": [],
+                        "completo": False
+                    }
+                    st.session_state["paginacion"] = paginacion
+                if not paginacion["paginas"]:
+                    cargar_pagina()
+                paginas = paginacion["paginas"]
+                datos = pa.concat_tables(paginas) if paginas else pa.table({})
+            else:
+                datos = futuro_datos.result()
+        
+        # Sin filtros se muestra la tabla Arrow tal cual; pandas solo con filtro activo
+        df = datos
         
-        if df.empty:
+        if datos.num_rows == 0:
             st.warning("⚠️ La tabla está vacía")
         else:
-            st.success(f"✅ {len(df):,} filas cargadas correctamente")
+            st.success(f"✅ {datos.num_rows:,} filas cargadas correctamente")
+            
+            # Clasificación sobre un DataFrame vacío con el mismo esquema (sin convertir filas)
+            columnas_texto, cols_numericas = clasificar_columnas(
+                datos.schema.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+            )
             
             # Filtros
             with st.expander("🔍 Aplicar Filtros"):
-                columnas_texto = df.select_dtypes(include=['object']).columns.tolist()
                 
                 if columnas_texto:
                     col_filtro = st.selectbox("Columna:", ["Ninguna"] + columnas_texto)
                     
                     if col_filtro != "Ninguna":
-                        valores_unicos = df[col_filtro].unique().tolist()
-                        valor_filtro = st.multiselect(
-                            f"Valores de {col_filtro}:",
-                            options=sorted(valores_unicos[:100])
-                        )
+                        # DISTINCT y filtro resueltos en Snowflake (poda de micro-particiones)
+                        # Form: elegir valores no dispara reruns; la query sale solo al aplicar
+                        with st.form("form_filtro"):
+                            valor_filtro = st.multiselect(
+                                f"Valores de {col_filtro}:",
+                                options=valores_distintos(tabla_seleccionada, col_filtro)
+                            )
+                            if st.form_submit_button("✅ Aplicar filtro"):
+                                st.session_state["filtro_aplicado"] = (
+                                    tabla_seleccionada, col_filtro, valor_filtro
+                                )
                         
-                        if valor_filtro:
-                            df = df[df[col_filtro].isin(valor_filtro)]
+                        filtro = st.session_state.get("filtro_aplicado")
+                        if filtro and filtro[:2] == (tabla_seleccionada, col_filtro) and filtro[2]:
+                            df = ejecutar_query(*construir_query_datos(
+                                tabla_seleccionada, limite_filas, col_filtro, filtro[2]
+                            ))
                             st.info(f"✅ Filtrado: {len(df):,} filas")
                 else:
                     st.info("No hay columnas de texto para filtrar")
             
-            # Mostrar datos
-            st.dataframe(df, use_container_width=True, height=500)
+            # Mostrar datos (paginados si el resultado viene por lotes y no hay filtro)
+            if por_lotes and df is datos:
+                col1, col2 = st.columns([1, 3])
+                with col1:
+                    pagina = st.number_input(
+                        "Página:",
+                        min_value=1,
+                        max_value=len(paginas),
+                        value=len(paginas)
+                    )
+                with col2:
+                    st.caption(
+                        f"{len(paginas)} página(s) de {FILAS_POR_LOTE:,} filas cargadas"
+                        + ("" if paginacion["completo"] else " · hay más")
+                    )
+                st.dataframe(paginas[pagina - 1], use_container_width=True, height=500)
+                st.button(
+                    "⬇️ Cargar más",
+                    on_click=cargar_pagina,
+                    disabled=paginacion["completo"]
+                )
+            elif len(df) > FILAS_POR_LOTE:
+                # Resultado filtrado grande: al navegador solo viaja la página visible
+                total_paginas = -(-len(df) // FILAS_POR_LOTE)
+                col1, col2 = st.columns([1, 3])
+                with col1:
+                    pagina = st.number_input(
+                        "Página:",
+                        min_value=1,
+                        max_value=total_paginas,
+                        value=1,
+                        key="pagina_filtrada"
+                    )
+                with col2:
+                    st.caption(f"{total_paginas} página(s) de {FILAS_POR_LOTE:,} filas")
+                st.dataframe(
+                    df.iloc[(pagina - 1) * FILAS_POR_LOTE:pagina * FILAS_POR_LOTE],
+                    use_container_width=True,
+                    height=500
+                )
+            else:
+                st.dataframe(df, use_container_width=True, height=500)
             
             # Descargar
             col1, col2 = st.columns([3, 1])
+            with col1:
+                formato = st.radio("Formato:", ["CSV", "Parquet"], horizontal=True)
             with col2:
-                csv = df.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="📥 Descargar CSV",
-                    data=csv,
-                    file_name=f"{tabla_seleccionada}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+                nombre_archivo = f"{tabla_seleccionada}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                if formato == "Parquet":
+                    st.download_button(
+                        label="📥 Descargar Parquet",
+                        data=df_a_parquet(df),
+                        file_name=f"{nombre_archivo}.parquet",
+                        mime="application/vnd.apache.parquet",
+                        use_container_width=True
+                    )
+                else:
+                    st.download_button(
+                        label="📥 Descargar CSV",
+                        data=df_a_csv(df),
+                        file_name=f"{nombre_archivo}.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
             
             # Análisis rápido
             st.markdown("---")
             st.markdown("### 📊 Análisis Rápido")
             
-            tab1, tab2 = st.tabs(["📈 Estadísticas", "📊 Frecuencias"])
-            
-            with tab1:
-                cols_numericas = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-                
-                if cols_numericas:
-                    st.dataframe(df[cols_numericas].describe(), use_container_width=True)
-                else:
-                    st.info("No hay columnas numéricas para analizar")
-            
-            with tab2:
-                if len(df.columns) > 0:
-                    col_analisis = st.selectbox(
-                        "Selecciona columna:",
-                        options=df.columns.tolist()
-                    )
-                    
-                    if col_analisis:
-                        top_valores = df[col_analisis].value_counts().head(10)
-                        
-                        col1, col2 = st.columns([2, 1])
-                        
-                        with col1:
-                            st.bar_chart(top_valores)
-                        
-                        with col2:
-                            st.dataframe(
-                                top_valores.reset_index().rename(
-                                    columns={'index': col_analisis, col_analisis: 'Frecuencia'}
-                                ),
-                                use_container_width=True
-                            )
+            analisis_rapido(tabla_seleccionada, df, cols_numericas, datos.column_names)
 
 # ============================================================================
 # PÁGINA: QUERY PERSONALIZADA
@@ -594,10 +629,29 @@ elif menu_option == "🔍 Query SQL":
         if limpiar:
             st.rerun()
     
+    with col3:
+        permitir_pesadas = st.checkbox(
+            "⚠️ Permitir queries pesadas",
+            help=f"Sin marcar, se bloquean queries que escanean más de {UMBRAL_PARTICIONES:,} micro-particiones"
+        )
+    
     if ejecutar:
         try:
+            # Preflight: tope de filas y costo estimado por EXPLAIN antes de ejecutar
+            query_final = preparar_query_libre(query_custom)
+            if query_final != query_custom.strip().rstrip(";").strip():
+                st.caption(f"ℹ️ Query sin LIMIT: se limita a {LIMITE_QUERY_LIBRE:,} filas")
+            
+            particiones = particiones_estimadas(query_final)
+            if particiones and particiones > UMBRAL_PARTICIONES and not permitir_pesadas:
+                st.warning(
+                    f"⚠️ La query escanearía {particiones:,} micro-particiones. "
+                    "Marca **Permitir queries pesadas** para ejecutarla."
+                )
+                st.stop()
+            
             with st.spinner("⏳ Ejecutando query..."):
-                df_custom = ejecutar_query(query_custom)
+                df_custom = ejecutar_query(query_final)
             
             if df_custom.empty:
                 st.warning("⚠️ La consulta no retornó resultados")
@@ -610,7 +664,7 @@ elif menu_option == "🔍 Query SQL":
                 st.dataframe(df_custom, use_container_width=True, height=500)
                 
                 # Descarga
-                csv_custom = df_custom.to_csv(index=False).encode('utf-8-sig')
+                csv_custom = df_a_csv(df_custom)
                 st.download_button(
                     label="📥 Descargar Resultados CSV",
                     data=csv_custom,
@@ -640,21 +694,21 @@ elif menu_option == "⚙️ Configuración":
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("🗄️ Database", os.getenv('SNOWFLAKE_DATABASE', 'N/A'))
-            st.metric("👤 Usuario", os.getenv('SNOWFLAKE_USER', 'N/A'))
-            st.metric("🏢 Warehouse", os.getenv('SNOWFLAKE_WAREHOUSE', 'N/A'))
+            st.metric("🗄️ Database", env.get('SNOWFLAKE_DATABASE', 'N/A'))
+            st.metric("👤 Usuario", env.get('SNOWFLAKE_USER', 'N/A'))
+            st.metric("🏢 Warehouse", env.get('SNOWFLAKE_WAREHOUSE', 'N/A'))
         
         with col2:
-            st.metric("📂 Schema", os.getenv('SNOWFLAKE_SCHEMA', 'N/A'))
-            st.metric("🌐 Account", os.getenv('SNOWFLAKE_ACCOUNT', 'N/A'))
-            st.metric("👔 Role", os.getenv('SNOWFLAKE_ROLE', 'N/A'))
+            st.metric("📂 Schema", env.get('SNOWFLAKE_SCHEMA', 'N/A'))
+            st.metric("🌐 Account", env.get('SNOWFLAKE_ACCOUNT', 'N/A'))
+            st.metric("👔 Role", env.get('SNOWFLAKE_ROLE', 'N/A'))
         
         st.markdown("---")
         
         if st.button("🔄 Probar Conexión"):
             with st.spinner("Probando conexión..."):
                 try:
-                    test_df = ejecutar_query("SELECT CURRENT_USER(), CURRENT_DATABASE(), CURRENT_SCHEMA()")
+                    test_df = ejecutar_query_directo("SELECT CURRENT_USER(), CURRENT_DATABASE(), CURRENT_SCHEMA()")
                     st.success("✅ Conexión funcionando correctamente")
                     st.json({
                         "Usuario": test_df.iloc[0, 0],
@@ -674,7 +728,7 @@ elif menu_option == "⚙️ Configuración":
         
         📄 **`etl/.env`**
         
-        Ruta completa: `{Path(__file__).parent.parent / "etl" / ".env"}`
+        Ruta completa: `{ENV_PATH}`
         
         #### Parámetros requeridos:
         
@@ -694,13 +748,13 @@ elif menu_option == "⚙️ Configuración":
         st.markdown("### 🔍 Configuración Actual")
         
         config_data = {
-            "SNOWFLAKE_ACCOUNT": os.getenv('SNOWFLAKE_ACCOUNT', '❌ NO CONFIGURADO'),
-            "SNOWFLAKE_USER": os.getenv('SNOWFLAKE_USER', '❌ NO CONFIGURADO'),
-            "SNOWFLAKE_PASSWORD": '✅ Configurada' if os.getenv('SNOWFLAKE_PASSWORD') else '❌ NO CONFIGURADO',
-            "SNOWFLAKE_WAREHOUSE": os.getenv('SNOWFLAKE_WAREHOUSE', '❌ NO CONFIGURADO'),
-            "SNOWFLAKE_DATABASE": os.getenv('SNOWFLAKE_DATABASE', '❌ NO CONFIGURADO'),
-            "SNOWFLAKE_SCHEMA": os.getenv('SNOWFLAKE_SCHEMA', '❌ NO CONFIGURADO'),
-            "SNOWFLAKE_ROLE": os.getenv('SNOWFLAKE_ROLE', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_ACCOUNT": env.get('SNOWFLAKE_ACCOUNT', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_USER": env.get('SNOWFLAKE_USER', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_PASSWORD": '✅ Configurada' if env.get('SNOWFLAKE_PASSWORD') else '❌ NO CONFIGURADO',
+            "SNOWFLAKE_WAREHOUSE": env.get('SNOWFLAKE_WAREHOUSE', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_DATABASE": env.get('SNOWFLAKE_DATABASE', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_SCHEMA": env.get('SNOWFLAKE_SCHEMA', '❌ NO CONFIGURADO'),
+            "SNOWFLAKE_ROLE": env.get('SNOWFLAKE_ROLE', '❌ NO CONFIGURADO'),
         }
         
         df_config = pd.DataFrame(list(config_data.items()), columns=['Parámetro', 'Valor'])
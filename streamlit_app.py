@@ -10,18 +10,38 @@ Fecha: 2026-01-27
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import snowflake.connector
+from snowflake.connector.errors import NotSupportedError
 from datetime import datetime
 import os
 from pathlib import Path
 import subprocess
 import sys
+import time
+import queue
+from contextlib import contextmanager
+from typing import Optional
 import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Importar funciones de app_reportes_sql.py
-spec = importlib.util.spec_from_file_location("app_reportes_sql", Path(__file__).parent / "app_reportes_sql.py")
-app_sql = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(app_sql)
+# Bajo demanda (solo las páginas que lo usan) y una vez por proceso, no en cada rerun
+@st.cache_resource(show_spinner=False)
+def cargar_app_sql():
+    """Carga app_reportes_sql.py como módulo"""
+    spec = importlib.util.spec_from_file_location("app_reportes_sql", Path(__file__).parent / "app_reportes_sql.py")
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+# Ejecución de scripts ETL compartida con streamlit/app_reportes.py
+STREAMLIT_DIR = str(Path(__file__).parent / "streamlit")
+if STREAMLIT_DIR not in sys.path:
+    sys.path.insert(0, STREAMLIT_DIR)
+from _scripts_etl import ejecutar_script_streaming
 
 # ============================================================================
 # CONFIGURACIÓN INICIAL
@@ -34,6 +54,19 @@ try:
 except:
     pass
 
+# Niveles de cache: rápido para resultados de queries, lento para metadata/schema
+FAST_TTL = 60
+SLOW_TTL = 86400
+
+# Filas que se envían al navegador por defecto (la descarga CSV siempre lleva todo)
+FILAS_VISTA_PREVIA = 200
+
+# Resultados más grandes que esto no se guardan en el cache de run_query
+LIMITE_CACHE_BYTES = 50_000_000
+
+# Cache en disco del inventario de tablas (sobrevive reinicios del contenedor)
+CACHE_DIR = Path.home() / ".cache" / "genomma"
+
 # Configuración de la página
 st.set_page_config(
     page_title="Genomma Lab - Dashboard Snowflake",
@@ -46,106 +79,23 @@ st.set_page_config(
 # ESTILOS CSS
 # ============================================================================
 
-st.markdown("""
-<style>
-    /* Ocultar TODOS los elementos del header y toolbar */
-    #MainMenu {visibility: hidden !important;}
-    header {visibility: hidden !important;}
-    footer {visibility: hidden !important;}
-    
-    /* Ocultar toolbar completo con todos los botones */
-    [data-testid="stToolbar"] {
-        visibility: hidden !important;
-        display: none !important;
-    }
-    
-    /* Ocultar decoraciones y badges */
-    [data-testid="stDecoration"] {display: none !important;}
-    [data-testid="stStatusWidget"] {display: none !important;}
-    
-    /* Ocultar "Hosted with Streamlit" y botón de GitHub */
-    [data-testid="stAppViewBlockContainer"] > div:first-child {
-        display: none !important;
-    }
-    
-    /* Ocultar elementos específicos de GitHub */
-    a[href*="github.com"] {display: none !important;}
-    button[kind="header"] {display: none !important;}
-    
-    /* Ocultar TODOS los badges y enlaces del footer */
-    footer {visibility: hidden !important;}
-    footer:after {content: ''; visibility: hidden; display: none;}
-    .viewerBadge_container__1QSob {display: none !important;}
-    .viewerBadge_link__1S137 {display: none !important;}
-    .viewerBadge_text__1JaDK {display: none !important;}
-    
-    /* Ocultar elementos en esquina inferior */
-    [data-testid="stBottom"] {display: none !important;}
-    [class*="viewerBadge"] {display: none !important;}
-    
-    /* Ocultar botones de gestión */
-    [data-testid="manage-app-button"] {display: none !important;}
-    [data-testid="deploy-button"] {display: none !important;}
-    
-    /* Ocultar cualquier iframe o elemento externo */
-    iframe[title*="GitHub"] {display: none !important;}
-    iframe[title*="Streamlit"] {display: none !important;}
-    
-    /* Ocultar elementos con clase st-emotion */
-    [class*="st-emotion"][class*="eqpbllx"] {display: none !important;}
-    
-    /* Ocultar header actions */
-    [data-testid="stHeaderActionElements"] {display: none !important;}
-    
-    /* Sidebar con diseño mejorado */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #1e3c72 0%, #2a5298 100%);
-    }
-    
-    [data-testid="stSidebar"] * {
-        color: white !important;
-    }
-    
-    /* Botones con gradiente */
-    .stButton > button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 0.5rem 1rem;
-        border-radius: 0.5rem;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.4);
-    }
-    
-    /* Header principal */
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: 800;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 2rem;
-    }
-    
-    /* Cards de métricas */
-    .metric-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 0.5rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    }
-</style>
-""", unsafe_allow_html=True)
+# CSS Personalizado (archivo estático, leído una vez por proceso)
+# cache_resource: el mismo str en cada rerun, sin la copia (pickle) de cache_data
+@st.cache_resource(show_spinner=False)
+def load_css() -> str:
+    """Contenido de static/styles.css"""
+    return (Path(__file__).parent / "static" / "styles.css").read_text(encoding="utf-8")
 
 # ============================================================================
 # CONEXIÓN A SNOWFLAKE
 # ============================================================================
 
+# Sesión viva en reposo (sin re-handshake) y timeout de red acotado
+OPCIONES_CONEXION = {
+    "client_session_keep_alive": True,
+    "network_timeout": 60
+}
+
 @st.cache_resource
 def get_connection():
     """Establece y retorna una conexión a Snowflake"""
@@ -159,7 +109,8 @@ def get_connection():
                 warehouse=st.secrets.snowflake.warehouse,
                 database=st.secrets.snowflake.database,
                 schema=st.secrets.snowflake.schema,
-                role=st.secrets.snowflake.role
+                role=st.secrets.snowflake.role,
+                **OPCIONES_CONEXION
             )
         else:
             # Usar variables de entorno
@@ -170,23 +121,108 @@ def get_connection():
                 warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
                 database=os.getenv("SNOWFLAKE_DATABASE"),
                 schema=os.getenv("SNOWFLAKE_SCHEMA"),
-                role=os.getenv("SNOWFLAKE_ROLE")
+                role=os.getenv("SNOWFLAKE_ROLE"),
+                **OPCIONES_CONEXION
             )
         return conn
     except Exception as e:
         st.error(f"❌ Error al conectar con Snowflake: {str(e)}")
         return None
 
-@st.cache_data(ttl=300)
-def run_query(query: str) -> pd.DataFrame:
-    """Ejecuta una query en Snowflake y retorna un DataFrame"""
+def conexion_activa():
+    """Conexión cacheada; si Snowflake la cerró, se descarta y se reconecta"""
     conn = get_connection()
+    if conn is not None and conn.is_closed():
+        get_connection.clear()
+        conn = get_connection()
+    return conn
+
+@st.cache_resource
+def get_cursor_pool() -> queue.LifoQueue:
+    """Pool de cursores reutilizables (LIFO: el último devuelto es el más reciente)"""
+    return queue.LifoQueue(maxsize=4)
+
+@contextmanager
+def prestar_cursor(conn):
+    """Toma un cursor del pool (o crea uno) y lo devuelve al terminar"""
+    pool = get_cursor_pool()
+    try:
+        cursor = pool.get_nowait()
+        # Descartar cursores cerrados o de una conexión anterior
+        if cursor.is_closed() or cursor.connection is not conn:
+            cursor = conn.cursor()
+    except queue.Empty:
+        cursor = conn.cursor()
+    
+    try:
+        yield cursor
+    finally:
+        try:
+            pool.put_nowait(cursor)
+        except queue.Full:
+            cursor.close()
+
+def identidad_conexion(conn) -> tuple:
+    """Cuenta, usuario, rol, base de datos y schema de una conexión (alcance del cache)"""
+    return conn.account, conn.user, conn.role, conn.database, conn.schema
+
+def run_query(query: str, params: tuple = None) -> pd.DataFrame:
+    """
+    Ejecuta una query en Snowflake y retorna un DataFrame
+    Con params el texto SQL queda fijo (bind %s): reutiliza el result cache de Snowflake
+    El cache se separa por identidad de conexión: otras credenciales no reciben resultados ajenos
+    """
+    conn = conexion_activa()
+    if conn is None:
+        return pd.DataFrame()
+    df = run_query_conexion(query, params, identidad_conexion(conn))
+    if df is None:
+        # Resultado mayor a LIMITE_CACHE_BYTES: se trae por el camino sin cache
+        df = ejecutar_query(conn, query, params)
+    return df
+
+def tamano_resultado(cursor) -> int:
+    """Bytes sin comprimir del resultado según la metadata de sus lotes (sin descargarlos)"""
+    lotes = cursor.get_result_batches() or []
+    return sum(lote.uncompressed_size or 0 for lote in lotes)
+
+def leer_resultado(cursor) -> pd.DataFrame:
+    """DataFrame con el resultado del cursor ya ejecutado"""
+    try:
+        # Arrow → pandas en una conversión (sin tuplas Python ni concat de lotes)
+        return reducir_tipos(cursor.fetch_pandas_all())
+    except NotSupportedError:
+        # SHOW/DESCRIBE devuelven JSON, no Arrow
+        columns = [desc[0] for desc in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+@st.cache_data(ttl=FAST_TTL, max_entries=64, show_spinner=False)
+def run_query_conexion(query: str, params: tuple, identidad: tuple) -> Optional[pd.DataFrame]:
+    """
+    Ejecución cacheada de run_query (clave: query + params + identidad de conexión)
+    Solo se cachean resultados de hasta LIMITE_CACHE_BYTES; los más grandes no se
+    descargan aquí y devuelven None (run_query los trae con ejecutar_query)
+    """
+    conn = conexion_activa()
     if conn is None:
         return pd.DataFrame()
     
     try:
-        df = pd.read_sql(query, conn)
-        return df
+        with prestar_cursor(conn) as cursor:
+            cursor.execute(query, params)
+            if tamano_resultado(cursor) > LIMITE_CACHE_BYTES:
+                return None
+            return leer_resultado(cursor)
+    except Exception as e:
+        st.error(f"❌ Error al ejecutar query: {str(e)}")
+        return pd.DataFrame()
+
+def ejecutar_query(conn, query: str, params: tuple = None) -> pd.DataFrame:
+    """Ejecución sin cache de run_query para resultados mayores a LIMITE_CACHE_BYTES"""
+    try:
+        with prestar_cursor(conn) as cursor:
+            cursor.execute(query, params)
+            return leer_resultado(cursor)
     except Exception as e:
         st.error(f"❌ Error al ejecutar query: {str(e)}")
         return pd.DataFrame()
@@ -195,41 +231,127 @@ def run_query(query: str) -> pd.DataFrame:
 # FUNCIONES AUXILIARES
 # ============================================================================
 
-def get_tables_list():
-    """Obtiene lista de tablas disponibles"""
+def reducir_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Achica el DataFrame antes de cachearlo: enteros al ancho mínimo y strings
+    repetitivos como category (floats sin tocar: no se pierde precisión en montos)
+    """
+    if df.empty:
+        return df
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in df.select_dtypes(include='object').columns:
+        if df[col].nunique() < 0.5 * len(df):
+            df[col] = df[col].astype('category')
+    return df
+
+def contexto_activo():
+    """Cuenta, base de datos y schema de la conexión actual (clave de cache del inventario)"""
+    conn = conexion_activa()
+    if conn is None:
+        return None, None, None
+    return conn.account, conn.database, conn.schema
+
+def ruta_cache_inventario(account: str, database: str) -> Path:
+    """Archivo parquet con el inventario de tablas de una cuenta/base de datos"""
+    return CACHE_DIR / f"tables_{account}_{database}.parquet"
+
+@st.cache_data(ttl=SLOW_TTL, show_spinner=False)
+def get_tables_list(account: str = None, database: str = None, schema: str = None):
+    """
+    Obtiene lista de tablas disponibles
+    Cacheado 1 día en memoria y en disco (parquet por cuenta/base de datos);
+    se invalida con "🔄 Refrescar tablas"
+    """
+    ruta = ruta_cache_inventario(account, database)
+    try:
+        if time.time() - ruta.stat().st_mtime < SLOW_TTL:
+            return pd.read_parquet(ruta)
+    except Exception:
+        pass  # Sin archivo o ilegible: se consulta Snowflake
+    
     query = """
     SELECT TABLE_SCHEMA, TABLE_NAME, ROW_COUNT, BYTES 
     FROM INFORMATION_SCHEMA.TABLES 
     WHERE TABLE_SCHEMA != 'INFORMATION_SCHEMA'
     ORDER BY TABLE_SCHEMA, TABLE_NAME
     """
-    return run_query(query)
+    df = run_query(query)
+    
+    if not df.empty and account and database:
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(ruta, index=False)
+        except Exception:
+            pass  # Disco de solo lectura: queda solo el cache en memoria
+    
+    return df
+
+@st.cache_data(ttl=SLOW_TTL, show_spinner=False)
+def get_connection_status(identidad: tuple) -> tuple:
+    """Base de datos y schema vigentes de la sesión (clave: identidad de conexión)"""
+    conn = conexion_activa()
+    if conn is None:
+        raise ValueError("sin conexión a Snowflake")
+    # Dos escalares: fetchone directo, sin DataFrame
+    with prestar_cursor(conn) as cursor:
+        cursor.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()")
+        database, schema = cursor.fetchone()
+    return database, schema
+
+@st.cache_data(ttl=SLOW_TTL, show_spinner=False)
+def get_db_totals(identidad: tuple) -> tuple:
+    """
+    Totales de la base de datos agregados en Snowflake (una fila, no el inventario completo)
+    
+    Returns:
+        (total_tablas, total_filas, total_bytes)
+    """
+    conn = conexion_activa()
+    if conn is None:
+        raise ValueError("sin conexión a Snowflake")
+    with prestar_cursor(conn) as cursor:
+        cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(ROW_COUNT), 0), COALESCE(SUM(BYTES), 0)
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA != 'INFORMATION_SCHEMA'
+        """)
+        return tuple(int(valor) for valor in cursor.fetchone())
+
+def mostrar_resultado(df: pd.DataFrame, mostrar_todo: bool = False):
+    """st.dataframe con las primeras FILAS_VISTA_PREVIA filas salvo que se pida todo"""
+    if mostrar_todo or len(df) <= FILAS_VISTA_PREVIA:
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.dataframe(df.head(FILAS_VISTA_PREVIA), use_container_width=True, hide_index=True)
+        st.caption(f"Mostrando {FILAS_VISTA_PREVIA} de {len(df):,} filas · marca **Mostrar todo** o descarga el CSV")
 
 def get_table_preview(schema: str, table: str, limit: int = 100):
     """Obtiene preview de una tabla"""
-    query = f'SELECT * FROM "{schema}"."{table}" LIMIT {limit}'
-    return run_query(query)
+    # Nombre calificado entre comillas (escapadas) resuelto por IDENTIFIER en Snowflake
+    nombre = ".".join('"' + parte.replace('"', '""') + '"' for parte in (schema, table))
+    return run_query("SELECT * FROM IDENTIFIER(%s) LIMIT %s", (nombre, int(limit)))
 
 def ejecutar_script_etl(script_name: str, script_path: Path):
-    """Ejecuta un script ETL y muestra el output"""
+    """
+    Ejecuta un script ETL mostrando su salida a medida que se genera
+    Al terminar reemplaza la salida en vivo por el resultado final
+    """
     try:
         with st.spinner(f"Ejecutando {script_name}..."):
-            result = subprocess.run(
-                [sys.executable, str(script_path)],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
+            placeholder = st.empty()
+            returncode, salida = ejecutar_script_streaming(script_path, placeholder)
+            placeholder.empty()
             
-            if result.returncode == 0:
+            if returncode == 0:
                 st.success(f"✅ {script_name} completado exitosamente")
-                if result.stdout:
+                if salida:
                     with st.expander("Ver salida"):
-                        st.code(result.stdout, language="text")
+                        st.code(salida, language="text")
             else:
                 st.error(f"❌ Error en {script_name}")
-                if result.stderr:
-                    st.code(result.stderr, language="text")
+                if salida:
+                    st.code(salida, language="text")
                     
     except subprocess.TimeoutExpired:
         st.error(f"❌ {script_name} excedió el tiempo límite de 5 minutos")
@@ -250,7 +372,7 @@ def menu_lateral():
         # Opciones de menú
         opcion = st.radio(
             "Navegación",
-            ["🏠 Inicio", "📊 Explorar Datos", "💻 Query SQL", "🔧 Pipeline ETL", "📈 Reportes SQL Server", "⚙️ Configuración"],
+            list(PAGINAS),
             label_visibility="collapsed"
         )
         
@@ -269,20 +391,20 @@ def pagina_inicio():
     st.markdown('<h1 class="main-header">🌎 Genomma Lab - Dashboard Snowflake</h1>', unsafe_allow_html=True)
     
     # Verificar conexión
-    conn = get_connection()
+    conn = conexion_activa()
     
     if conn:
         st.success("✅ Conexión exitosa con Snowflake")
         
         # Información de la conexión
         try:
-            test_df = pd.read_sql("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()", conn)
+            database, schema = get_connection_status(identidad_conexion(conn))
             
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("📁 Base de Datos", test_df.iloc[0, 0])
+                st.metric("📁 Base de Datos", database)
             with col2:
-                st.metric("📂 Schema", test_df.iloc[0, 1])
+                st.metric("📂 Schema", schema)
                 
         except Exception as e:
             st.warning(f"⚠️ No se pudo obtener información de la conexión: {str(e)}")
@@ -291,19 +413,17 @@ def pagina_inicio():
         st.markdown("### 📈 Estadísticas")
         
         try:
-            tables_df = get_tables_list()
-            if not tables_df.empty:
+            total_tablas, total_rows, total_bytes = get_db_totals(identidad_conexion(conn))
+            if total_tablas:
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("📊 Total Tablas", len(tables_df))
+                    st.metric("📊 Total Tablas", total_tablas)
                 
                 with col2:
-                    total_rows = tables_df['ROW_COUNT'].sum()
                     st.metric("📝 Total Registros", f"{total_rows:,}")
                 
                 with col3:
-                    total_bytes = tables_df['BYTES'].sum()
                     total_mb = total_bytes / (1024 * 1024)
                     st.metric("💾 Tamaño Total", f"{total_mb:.2f} MB")
         except:
@@ -317,7 +437,14 @@ def pagina_explorar():
     """Página para explorar tablas"""
     st.markdown("## 📊 Explorar Datos")
     
-    tables_df = get_tables_list()
+    if st.button("🔄 Refrescar tablas"):
+        # run_query también cachea el SQL del inventario: limpiar ambos (y el parquet)
+        ruta_cache_inventario(*contexto_activo()[:2]).unlink(missing_ok=True)
+        get_tables_list.clear()
+        get_db_totals.clear()
+        run_query_conexion.clear()
+    
+    tables_df = get_tables_list(*contexto_activo())
     
     if tables_df.empty:
         st.warning("⚠️ No se encontraron tablas")
@@ -341,6 +468,7 @@ def pagina_explorar():
     
     with col2:
         limite = st.number_input("Límite de filas", min_value=10, max_value=1000, value=100)
+        mostrar_todo = st.checkbox("Mostrar todo", key="explorar_mostrar_todo")
     
     if st.button("📥 Cargar Preview", type="primary"):
         if tabla_seleccionada:
@@ -348,11 +476,11 @@ def pagina_explorar():
             preview_df = get_table_preview(schema, tabla, limite)
             
             if not preview_df.empty:
-                st.success(f"✅ Mostrando {len(preview_df)} filas de {schema}.{tabla}")
-                st.dataframe(preview_df, use_container_width=True)
+                st.success(f"✅ {len(preview_df)} filas cargadas de {schema}.{tabla}")
+                mostrar_resultado(preview_df, mostrar_todo)
                 
                 # Opción de descarga
-                csv = preview_df.to_csv(index=False).encode('utf-8')
+                csv = cargar_app_sql().exportar_a_csv(preview_df, f"{schema}_{tabla}")
                 st.download_button(
                     label="💾 Descargar CSV",
                     data=csv,
@@ -376,16 +504,19 @@ def pagina_query():
     with col1:
         ejecutar = st.button("▶️ Ejecutar", type="primary")
     
+    with col2:
+        mostrar_todo = st.checkbox("Mostrar todo", key="query_mostrar_todo")
+    
     if ejecutar and query.strip():
         try:
             df = run_query(query)
             
             if not df.empty:
                 st.success(f"✅ Query ejecutada. {len(df)} filas retornadas")
-                st.dataframe(df, use_container_width=True)
+                mostrar_resultado(df, mostrar_todo)
                 
                 # Descarga
-                csv = df.to_csv(index=False).encode('utf-8')
+                csv = cargar_app_sql().exportar_a_csv(df, "query_result")
                 st.download_button(
                     label="💾 Descargar CSV",
                     data=csv,
@@ -447,7 +578,7 @@ def pagina_configuracion():
     
     st.markdown("### 🔐 Credenciales Snowflake")
     
-    conn = get_connection()
+    conn = conexion_activa()
     
     if conn:
         st.success("✅ Conexión configurada correctamente")
@@ -479,8 +610,25 @@ def pagina_configuracion():
         2. **Streamlit Cloud:** Configura los secrets en la configuración del app
         """)
 
+# Parámetros de reportes SQL Server: nombre → (columna, widget que retorna el valor para el SP)
+PARAMETROS_REPORTE = {
+    'fecha_inicio': (0, lambda: st.date_input(
+        "📅 Fecha Inicio",
+        value=datetime.now().replace(day=1),
+        help="Fecha de inicio del período",
+        key="sql_fecha_inicio"
+    ).strftime('%Y-%m-%d')),
+    'fecha_fin': (1, lambda: st.date_input(
+        "📅 Fecha Fin",
+        value=datetime.now(),
+        help="Fecha de fin del período",
+        key="sql_fecha_fin"
+    ).strftime('%Y-%m-%d')),
+}
+
 def pagina_reportes_sql():
     """Página para ejecutar reportes de SQL Server"""
+    app_sql = cargar_app_sql()
     st.markdown('<h1 class="main-header">📈 Reportes SQL Server</h1>', unsafe_allow_html=True)
     
     st.markdown("""
@@ -638,27 +786,14 @@ def pagina_reportes_sql():
     if params_names:
         st.subheader("📝 Parámetros de Entrada")
         
-        col1, col2 = st.columns(2)
-        
-        if 'fecha_inicio' in params_names:
-            with col1:
-                fecha_inicio = st.date_input(
-                    "📅 Fecha Inicio",
-                    value=datetime.now().replace(day=1),
-                    help="Fecha de inicio del período",
-                    key="sql_fecha_inicio"
-                )
-                params_values.append(fecha_inicio.strftime('%Y-%m-%d'))
+        columnas = st.columns(2)
         
-        if 'fecha_fin' in params_names:
-            with col2:
-                fecha_fin = st.date_input(
-                    "📅 Fecha Fin",
-                    value=datetime.now(),
-                    help="Fecha de fin del período",
-                    key="sql_fecha_fin"
-                )
-                params_values.append(fecha_fin.strftime('%Y-%m-%d'))
+        # Un renderizador por parámetro conocido, en el orden que espera el SP
+        for nombre in params_names:
+            if nombre in PARAMETROS_REPORTE:
+                columna, renderizar = PARAMETROS_REPORTE[nombre]
+                with columnas[columna]:
+                    params_values.append(renderizar())
         
         st.markdown("---")
     
@@ -685,6 +820,7 @@ def pagina_reportes_sql():
         st.subheader("📊 Resultados")
         
         resultados = {}
+        tamanos_kb = {}  # memory_usage(deep=True) recorre cada string: se calcula una vez por país
         archivos_guardados = []
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
@@ -694,77 +830,98 @@ def pagina_reportes_sql():
         
         total_paises = len(paises_seleccionados)
         
-        for idx, pais in enumerate(paises_seleccionados):
-            status_text.text(f"Ejecutando en {pais}...")
+        # Una conexión por país (sin cache): los SP corren en paralelo en hilos;
+        # el contexto de Streamlit se propaga para que sus avisos sigan apareciendo
+        func_alt = config.get('funcion_alternativa')
+        ctx = get_script_run_ctx()
+        dfs = {}
+        
+        status_text.text(f"Ejecutando en {total_paises} país(es)...")
+        with st.spinner(f"Procesando {', '.join(paises_seleccionados)}..."):
+            with ThreadPoolExecutor(
+                max_workers=total_paises,
+                initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+            ) as executor:
+                futuros = {
+                    executor.submit(
+                        app_sql.ejecutar_con_fallback,
+                        pais,
+                        config['sp_name'],
+                        params_values if params_values else None,
+                        func_alt
+                    ): pais
+                    for pais in paises_seleccionados
+                }
+                
+                for completados, futuro in enumerate(as_completed(futuros), 1):
+                    pais = futuros[futuro]
+                    dfs[pais] = futuro.result()
+                    status_text.text(f"✅ {pais} listo ({completados}/{total_paises})")
+                    progress_bar.progress(completados / total_paises)
+        
+        # Resultados en el orden de selección (guardado y render en el hilo principal)
+        for pais in paises_seleccionados:
+            df = dfs[pais]
             
-            with st.spinner(f"Procesando {pais}..."):
-                # Usar función con fallback si existe función alternativa
-                func_alt = config.get('funcion_alternativa')
-                df = app_sql.ejecutar_con_fallback(
-                    pais, 
-                    config['sp_name'], 
-                    params_values if params_values else None,
-                    func_alt
-                )
+            if df is not None and not df.empty:
+                # Enteros al ancho mínimo (sin pérdida); los decimales quedan en float64
+                for col in df.select_dtypes(include='integer').columns:
+                    df[col] = pd.to_numeric(df[col], downcast='integer')
+                resultados[pais] = df
+                tamanos_kb[pais] = df.memory_usage(deep=True).sum() / 1024
+                
+                # Guardar CSV en carpeta del país
+                try:
+                    ruta_guardada = app_sql.guardar_csv_en_carpeta(
+                        df, 
+                        pais, 
+                        reporte_seleccionado,
+                        timestamp
+                    )
+                    archivos_guardados.append({
+                        'pais': pais,
+                        'ruta': ruta_guardada,
+                        'registros': len(df)
+                    })
+                except Exception as e:
+                    st.warning(f"⚠️ No se pudo guardar archivo en carpeta {pais}: {e}")
                 
-                if df is not None and not df.empty:
-                    resultados[pais] = df
+                # Mostrar resultados por país
+                with st.expander(f"🌎 {pais} - {len(df):,} registros", expanded=True):
+                    # Métricas
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("📊 Registros", f"{len(df):,}")
+                    with col2:
+                        st.metric("📋 Columnas", len(df.columns))
+                    with col3:
+                        st.metric("💾 Tamaño", f"{tamanos_kb[pais]:.1f} KB")
+                    with col4:
+                        st.metric("💾 Guardado", "✅" if any(a['pais'] == pais for a in archivos_guardados) else "❌")
                     
-                    # Guardar CSV en carpeta del país
-                    try:
-                        ruta_guardada = app_sql.guardar_csv_en_carpeta(
-                            df, 
-                            pais, 
-                            reporte_seleccionado,
-                            timestamp
-                        )
-                        archivos_guardados.append({
-                            'pais': pais,
-                            'ruta': ruta_guardada,
-                            'registros': len(df)
-                        })
-                    except Exception as e:
-                        st.warning(f"⚠️ No se pudo guardar archivo en carpeta {pais}: {e}")
+                    # Tabla de datos
+                    st.dataframe(
+                        df,
+                        use_container_width=True,
+                        height=400
+                    )
                     
-                    # Mostrar resultados por país
-                    with st.expander(f"🌎 {pais} - {len(df):,} registros", expanded=True):
-                        # Métricas
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.metric("📊 Registros", f"{len(df):,}")
-                        with col2:
-                            st.metric("📋 Columnas", len(df.columns))
-                        with col3:
-                            st.metric("💾 Tamaño", f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
-                        with col4:
-                            st.metric("💾 Guardado", "✅" if any(a['pais'] == pais for a in archivos_guardados) else "❌")
-                        
-                        # Tabla de datos
-                        st.dataframe(
-                            df,
-                            use_container_width=True,
-                            height=400
-                        )
-                        
-                        # Mostrar ruta del archivo guardado
-                        archivo_info = next((a for a in archivos_guardados if a['pais'] == pais), None)
-                        if archivo_info:
-                            st.success(f"📁 Guardado en: `{archivo_info['ruta']}`")
-                        
-                        # Botón de descarga individual
-                        csv = app_sql.exportar_a_csv(df, f"{reporte_seleccionado}_{pais}")
-                        st.download_button(
-                            label=f"📥 Descargar CSV - {pais}",
-                            data=csv,
-                            file_name=f"{reporte_seleccionado.replace(' ', '_')}_{pais}_{timestamp}.csv",
-                            mime="text/csv",
-                            key=f"download_{pais}"
-                        )
-                elif df is not None:
-                    st.warning(f"⚠️ {pais}: No se encontraron datos")
-            
-            # Actualizar progress bar
-            progress_bar.progress((idx + 1) / total_paises)
+                    # Mostrar ruta del archivo guardado
+                    archivo_info = next((a for a in archivos_guardados if a['pais'] == pais), None)
+                    if archivo_info:
+                        st.success(f"📁 Guardado en: `{archivo_info['ruta']}`")
+                    
+                    # Botón de descarga individual
+                    csv = app_sql.exportar_a_csv(df, f"{reporte_seleccionado}_{pais}")
+                    st.download_button(
+                        label=f"📥 Descargar CSV - {pais}",
+                        data=csv,
+                        file_name=f"{reporte_seleccionado.replace(' ', '_')}_{pais}_{timestamp}.csv",
+                        mime="text/csv",
+                        key=f"download_{pais}"
+                    )
+            elif df is not None:
+                st.warning(f"⚠️ {pais}: No se encontraron datos")
         
         status_text.text("✅ Ejecución completada")
         
@@ -848,9 +1005,11 @@ def pagina_reportes_sql():
             
             with col2:
                 # CSV consolidado con columna de país
-                df_consolidado = pd.concat(
-                    [df.assign(PAIS=pais) for pais, df in resultados.items()],
-                    ignore_index=True
+                # concat una sola vez y PAIS como categórica (códigos int8, no un str por fila)
+                df_consolidado = pd.concat(resultados.values(), ignore_index=True)
+                df_consolidado['PAIS'] = pd.Categorical.from_codes(
+                    np.repeat(np.arange(len(resultados)), [len(df) for df in resultados.values()]),
+                    categories=list(resultados.keys())
                 )
                 csv_consolidado = app_sql.exportar_a_csv(df_consolidado, f"{reporte_seleccionado}_consolidado")
                 st.download_button(
@@ -871,7 +1030,7 @@ def pagina_reportes_sql():
                     'País': pais,
                     'Registros': len(df),
                     'Columnas': len(df.columns),
-                    'Tamaño (KB)': df.memory_usage(deep=True).sum() / 1024
+                    'Tamaño (KB)': tamanos_kb[pais]
                 })
             
             df_resumen = pd.DataFrame(resumen_data)
@@ -892,25 +1051,27 @@ def pagina_reportes_sql():
 # APLICACIÓN PRINCIPAL
 # ============================================================================
 
+# Navegación: opción del menú → página
+PAGINAS = {
+    "🏠 Inicio": pagina_inicio,
+    "📊 Explorar Datos": pagina_explorar,
+    "💻 Query SQL": pagina_query,
+    "🔧 Pipeline ETL": pagina_pipeline,
+    "📈 Reportes SQL Server": pagina_reportes_sql,
+    "⚙️ Configuración": pagina_configuracion,
+}
+
 def main():
     """Función principal de la aplicación"""
     
+    # Estilos: se inyectan en cada rerun (Streamlit descarta los elementos que un rerun no vuelve a emitir)
+    st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
+    
     # Menú lateral
     opcion = menu_lateral()
     
     # Renderizar página según selección
-    if opcion == "🏠 Inicio":
-        pagina_inicio()
-    elif opcion == "📊 Explorar Datos":
-        pagina_explorar()
-    elif opcion == "💻 Query SQL":
-        pagina_query()
-    elif opcion == "🔧 Pipeline ETL":
-        pagina_pipeline()
-    elif opcion == "📈 Reportes SQL Server":
-        pagina_reportes_sql()
-    elif opcion == "⚙️ Configuración":
-        pagina_configuracion()
+    PAGINAS[opcion]()
 
 if __name__ == "__main__":
     main()